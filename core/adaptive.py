@@ -0,0 +1,179 @@
+"""Adaptive follow-up generation for graded submissions.
+
+Works on a batch of submissions at once. The follow-up question is the one
+whose difficulty is closest to the student's mastery of the topic
+(core.mastery), found by bisecting a per-(subject, topic) array sorted by
+difficulty and cached per worker; its level becomes the registry key. Dedupe is one indexed
+lookup in the AdaptiveAssignment registry (unique per student, subject, topic
+and level) and the inserts are bulk_creates, so grading one submission and
+grading four hundred cost the same number of round-trips at any bank size.
+"""
+import random
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import dashboard_cache, mastery
+from .models import AdaptiveAssignment, Assignment, Question, VersionToken
+
+CREATED = 'created'
+EXISTS = 'exists'
+NO_QUESTIONS = 'no_questions'
+
+POOL_VERSION = 'adaptive:pool-version'  # VersionToken name
+_pools = {}  # (subject_id, topic_lower) -> TopicPool
+_pools_version = None
+
+
+class TopicPool:
+    """One subject topic's active questions sorted by difficulty."""
+
+    def __init__(self, rows):
+        # rows: (difficulty, id, level), already sorted by difficulty
+        self.difficulties = array('d', [row[0] for row in rows])
+        self.ids = array('q', [row[1] for row in rows])
+        self.levels = [row[2] for row in rows]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, target):
+        """(question_id, level) closest in difficulty to `target`, random among ties; None if empty."""
+        if not self.ids:
+            return None
+        d = self.difficulties
+        i = bisect_left(d, target)
+        gap = min(abs(d[j] - target) for j in (i - 1, i) if 0 <= j < len(d))
+        lo = bisect_left(d, target - gap - 1e-9)
+        hi = bisect_right(d, target + gap + 1e-9)
+        k = random.randrange(lo, hi)
+        return self.ids[k], self.levels[k]
+
+
+def adaptive_description(topic, level):
+    return f"Adaptive follow-up on {topic} (Level: {level})"
+
+
+def invalidate_question_pools():
+    """Drop every process's cached pools (Question signals, load_questions and recalibrate_mastery call this).
+
+    The token lives in the database rather than the cache: with a
+    per-process cache a bump from a management command would never reach
+    the web and worker processes.
+    """
+    VersionToken.objects.update_or_create(name=POOL_VERSION, defaults={'token': uuid.uuid4().hex})
+
+
+def question_pools(keys):
+    """{(subject_id, topic_lower): TopicPool} for the given keys, loaded once per worker.
+
+    Online grading nudges difficulties without invalidating; the pools pick
+    those up on the next invalidation (question edits, load_questions or the
+    nightly recalibrate_mastery).
+    """
+    global _pools_version
+    version = VersionToken.objects.filter(name=POOL_VERSION).values_list('token', flat=True).first() or ''
+    if version != _pools_version:
+        _pools.clear()
+        _pools_version = version
+
+    missing = set(keys) - set(_pools)
+    if missing:
+        rows = {key: [] for key in missing}
+        # Seeks question_live_pool_idx; sorted here rather than by the database, which would need a temp B-tree
+        for qid, subject_id, topic, level, difficulty in Question.objects.annotate(
+            topic_l=Lower('topic'), level_l=Lower('level'),
+        ).filter(
+            subject_id__in={key[0] for key in missing}, topic_l__in={key[1] for key in missing}, is_retired=False,
+        ).values_list('id', 'subject_id', 'topic_l', 'level_l', 'difficulty'):
+            if (subject_id, topic) in rows:
+                rows[subject_id, topic].append((difficulty, qid, level))
+        _pools.update({key: TopicPool(sorted(key_rows)) for key, key_rows in rows.items()})
+    return _pools
+
+
+def generate_followups(submissions, teacher):
+    """Create one adaptive assignment per (student, subject, topic, level) not already registered.
+
+    `submissions` must have assignment loaded and a non-null score, and their
+    grades should already be recorded in core.mastery so the pick reflects
+    them. Returns {submission.id: (outcome, level)} with outcome CREATED,
+    EXISTS or NO_QUESTIONS.
+    """
+    try:
+        return _generate_followups(submissions, teacher)
+    except IntegrityError:
+        # A concurrent grader registered one of the same follow-ups first; the retry sees it as EXISTS
+        return _generate_followups(submissions, teacher)
+
+
+def _generate_followups(submissions, teacher):
+    ability_of = mastery.abilities(mastery.key_for(s) for s in submissions)
+    pools = question_pools({mastery.key_for(s)[1:] for s in submissions})
+
+    wanted = {}  # registry key -> (first submission asking for it, picked question id)
+    results = {}
+    for submission in submissions:
+        student_id, subject_id, topic = mastery.key_for(submission)
+        ability = ability_of.get((student_id, subject_id, topic), 0.0)
+        pick = pools[subject_id, topic].nearest(ability)
+        if pick is None:
+            results[submission.id] = (NO_QUESTIONS, mastery.level_for_ability(ability))
+            continue
+        question_id, level = pick
+        results[submission.id] = (EXISTS, level)
+        wanted.setdefault((student_id, subject_id, topic, level), (submission, question_id))
+    if not wanted:
+        return results
+
+    # Specific dupe check: Per student + subject + topic + level, via the registry's unique index
+    existing = set(AdaptiveAssignment.objects.filter(
+        student_id__in={key[0] for key in wanted},
+        topic__in={key[2] for key in wanted},
+    ).values_list('student_id', 'subject_id', 'topic', 'level'))
+
+    now = timezone.now()
+    to_create = []
+    for key, (submission, question_id) in wanted.items():
+        if key in existing:
+            continue
+        level = key[3]
+        assignment = Assignment(
+            subject_id=key[1],
+            topic=submission.assignment.topic,
+            description=adaptive_description(submission.assignment.topic, level),
+            announcement_date=now,
+            due_date=now + timedelta(days=7),
+            created_by=teacher,
+            is_adaptive=True,
+        )
+        to_create.append((key, submission, question_id, assignment))
+        results[submission.id] = (CREATED, level)
+
+    if to_create:
+        with transaction.atomic():
+            created = Assignment.objects.bulk_create([assignment for _, _, _, assignment in to_create])
+            AdaptiveAssignment.objects.bulk_create([
+                AdaptiveAssignment(
+                    assignment_id=assignment.id, student_id=key[0], subject_id=key[1], topic=key[2], level=key[3],
+                    source_submission_id=submission.id,
+                )
+                for (key, submission, _, _), assignment in zip(to_create, created)
+            ])
+            Assignment.questions.through.objects.bulk_create([
+                Assignment.questions.through(assignment_id=assignment.id, question_id=question_id)
+                for (_, _, question_id, _), assignment in zip(to_create, created)
+            ])
+            Assignment.students.through.objects.bulk_create([
+                Assignment.students.through(assignment_id=assignment.id, user_id=submission.student_id)
+                for (_, submission, _, _), assignment in zip(to_create, created)
+            ])
+        # bulk_create sends no signals; invalidate the cached dashboards ourselves
+        dashboard_cache.bump('subject', *{assignment.subject_id for assignment in created})
+        dashboard_cache.bump('user', *{submission.student_id for _, submission, _, _ in to_create})
+    return results
@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import User, Subject, Enrollment, Question, Assignment, Submission
+from .models import User, Subject, Enrollment, Question, Assignment, Submission, ArchivedSubmission, Job
 
 admin.site.register(User)
 admin.site.register(Subject)
 admin.site.register(Enrollment)
 admin.site.register(Question)
 admin.site.register(Assignment)
-admin.site.register(Submission)
\ No newline at end of file
+admin.site.register(Submission)
+admin.site.register(ArchivedSubmission)
+admin.site.register(Job)
\ No newline at end of file
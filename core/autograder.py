@@ -0,0 +1,378 @@
+"""Sandboxed auto-grading of Python answers against per-question test cases.
+
+Question.test_cases is a list of {"stdin": ..., "stdout": ...}. Every case
+runs the student's answer as a script in its own short-lived interpreter,
+isolated by the kernel rather than by anything inside that interpreter:
+
+- LAUNCHER unshares new mount, network, IPC, UTS and PID namespaces: no
+  network at all, no view of other processes, and every process of the run
+  dies with it;
+- it builds a fresh root from read-only binds of the system and Python
+  install directories only (no project files, no database, no settings),
+  plus the run's own directory as /sandbox, and chroots into it;
+- it then runs as the AUTOGRADER['RUN_AS'] user with no_new_privs, sets
+  RLIMIT_CPU / AS / FSIZE / NPROC, and execs the answer; a wall-clock
+  timeout kills the whole group.
+
+The worker doesn't need root. Started as an ordinary user, LAUNCHER also
+unshares a user namespace, which is what allows the mounts and the chroot,
+and maps the worker's uid to RUN_AS's uid inside it; that uid isn't 0 there,
+so the execve of the answer drops every capability the namespace granted,
+and the chroot can't be left again. Started as root (e.g. on a kernel with
+unprivileged user namespaces disabled), it drops to the host RUN_AS user
+instead, with no supplementary groups.
+
+When neither works nothing runs: sandbox_error() says why and the
+submissions are left for manual grading.
+
+Feedback is built from outcomes only: the program's stdout and stderr are
+never copied into it, since students read their feedback.
+
+Cases from many submissions are flattened and fanned out over a pool; each
+slot only waits on its child process, so the pool is threads and the
+parallelism is the children. Scores (passed / total cases, out of
+grading.MAX_SCORE) are written back through grading.apply_grades so stats,
+mastery and adaptive follow-ups behave exactly as for manual grading.
+"""
+import errno
+import logging
+import os
+import pwd
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import counters, grading
+from .models import Question, Submission, User, parse_answers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    'CPU_SECONDS': 2,
+    'MEMORY_MB': 256,
+    'WALL_SECONDS': 5,
+    'OUTPUT_KB': 256,
+    'PROCESSES': 64,     # RLIMIT_NPROC, counted across all runs of RUN_AS
+    'WORKERS': None,     # None -> os.cpu_count()
+    'RUN_AS': 'nobody',  # Unprivileged user the answers run as; must own nothing of the project
+}
+
+PASS = 'pass'
+FAIL = 'fail'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+MEMORY = 'memory'
+OUTPUT_LIMIT = 'output_limit'
+
+METRICS = ('submissions', 'runs', 'passed', 'timeouts', 'memory', 'errors', 'busy_ms')
+
+# Runs in the grader's place: namespaces, read-only root, chroot, privilege drop, exec. argv: root dir, sandbox dir,
+# uid, gid, cpu seconds, memory bytes, output bytes, processes, python, read-only dirs...
+LAUNCHER = r'''
+import ctypes, os, resource, signal, sys
+
+root, box = sys.argv[1], sys.argv[2]
+uid, gid, cpu, mem, fsize, nproc = (int(v) for v in sys.argv[3:9])
+python, readonly = sys.argv[9], sys.argv[10:]
+
+libc = ctypes.CDLL(None, use_errno=True)
+CLONE_NEWNS, CLONE_NEWUTS, CLONE_NEWIPC, CLONE_NEWPID, CLONE_NEWNET = 0x20000, 0x4000000, 0x8000000, 0x20000000, 0x40000000
+CLONE_NEWUSER = 0x10000000
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_NOEXEC, MS_REMOUNT, MS_BIND, MS_REC, MS_PRIVATE = 1, 2, 4, 8, 32, 4096, 16384, 1 << 18
+MS_NOATIME, MS_NODIRATIME, MS_RELATIME = 1024, 2048, 1 << 21
+PR_SET_NO_NEW_PRIVS = 38
+# Flags a remount inside a user namespace must keep (the kernel locks them): statvfs flag -> mount flag
+LOCKED = {os.ST_NOEXEC: MS_NOEXEC, os.ST_NOATIME: MS_NOATIME, os.ST_NODIRATIME: MS_NODIRATIME, os.ST_RELATIME: MS_RELATIME}
+
+
+def check(result, what):
+    if result != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, f'{what}: {os.strerror(err)}')
+
+
+def mount(source, target, fstype, flags, data=None):
+    check(libc.mount(source and source.encode(), target.encode(), fstype and fstype.encode(), flags,
+                     data and data.encode()), f'mount {target}')
+
+
+def locked(path):
+    flags = os.statvfs(path).f_flag
+    return sum(ms for st, ms in LOCKED.items() if flags & st)
+
+
+userns = os.geteuid() != 0
+host_uid, host_gid = os.geteuid(), os.getegid()
+check(libc.unshare(CLONE_NEWNS | CLONE_NEWUTS | CLONE_NEWIPC | CLONE_NEWPID | CLONE_NEWNET
+                   | (CLONE_NEWUSER if userns else 0)), 'unshare')
+if userns:  # Its own ids are all an unprivileged process may map
+    for name, line in (('uid_map', f'{uid} {host_uid} 1'), ('setgroups', 'deny'), ('gid_map', f'{gid} {host_gid} 1')):
+        with open(f'/proc/self/{name}', 'w') as f:
+            f.write(line)
+pid = os.fork()  # The child is PID 1 of the new namespace: when it exits, everything it started is killed
+if pid:
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):  # Die of the same signal so the grader sees SIGXCPU / SIGKILL
+        if os.WTERMSIG(status) != signal.SIGKILL:
+            signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+        os.kill(os.getpid(), os.WTERMSIG(status))
+    sys.exit(os.waitstatus_to_exitcode(status))
+
+mount(None, '/', None, MS_REC | MS_PRIVATE)  # Nothing below propagates back to the host
+mount('sandbox', root, 'tmpfs', MS_NOSUID | MS_NODEV, 'size=1m,mode=755')
+for path in readonly:
+    target = root + path
+    if os.path.islink(path):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.symlink(os.readlink(path), target)
+        continue
+    os.makedirs(target, exist_ok=True)
+    mount(path, target, None, MS_BIND | MS_REC)
+    mount(None, target, None, MS_BIND | MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV | locked(target))
+os.makedirs(root + '/dev')
+for device in ('null', 'zero', 'urandom'):
+    open(f'{root}/dev/{device}', 'w').close()
+    mount(f'/dev/{device}', f'{root}/dev/{device}', None, MS_BIND)
+os.makedirs(root + '/sandbox')
+mount(box, root + '/sandbox', None, MS_BIND | MS_NOSUID | MS_NODEV)
+mount(None, root, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+
+os.chroot(root)
+os.chdir('/sandbox')
+if not userns:  # In a user namespace setgroups is denied, and the worker's ids already are uid/gid
+    os.setgroups([])
+    os.setgid(gid)
+    os.setuid(uid)
+# No capabilities left once the answer is exec'd as a non-zero uid: the chroot can't be undone, nothing can be mounted
+check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), 'no_new_privs')
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+os.execve(python, [python, '-I', '-S', '-B', '-X', 'utf8', 'answer.py'],
+          {'PATH': '/usr/bin:/bin', 'HOME': '/sandbox', 'TMPDIR': '/sandbox', 'LANG': 'C.UTF-8'})
+'''
+
+
+def limits():
+    return {**DEFAULT_LIMITS, **getattr(settings, 'AUTOGRADER', {})}
+
+
+def _normalize(text):
+    return '\n'.join(line.rstrip() for line in text.strip().splitlines())
+
+
+def _readonly_dirs():
+    """System directories (and the Python installation) visible, read-only, inside the sandbox."""
+    dirs = [path for path in ('/bin', '/lib', '/lib32', '/lib64', '/usr') if os.path.lexists(path)]
+    prefix = os.path.realpath(sys.base_prefix)
+    if not any(prefix == d or prefix.startswith(d + os.sep) for d in dirs if not os.path.islink(d)):
+        dirs.append(prefix)
+    return dirs
+
+
+def sandbox_error(config=None):
+    """Why answers can't be run here, or None when the sandbox is available."""
+    config = config or limits()
+    if not sys.platform.startswith('linux'):
+        return 'the auto-grader sandbox needs Linux namespaces'
+    try:
+        user = pwd.getpwnam(config['RUN_AS'])
+    except KeyError:
+        return f'AUTOGRADER["RUN_AS"] user {config["RUN_AS"]!r} does not exist'
+    if user.pw_uid == 0:
+        return 'AUTOGRADER["RUN_AS"] must not be root'
+    if os.geteuid() != 0:
+        return _userns_error()
+    if os.stat(settings.BASE_DIR).st_uid == user.pw_uid:  # Answers run as this host user
+        return 'AUTOGRADER["RUN_AS"] must not own the project'
+    return None
+
+
+def _userns_error():
+    """Why an unprivileged worker can't create the user namespace LAUNCHER needs, or None."""
+    for path, disabled in (('/proc/sys/user/max_user_namespaces', '0'),
+                           ('/proc/sys/kernel/unprivileged_userns_clone', '0'),  # Debian, older Ubuntu
+                           ('/proc/sys/kernel/apparmor_restrict_unprivileged_userns', '1')):  # Ubuntu 23.10+
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value == disabled:
+            return f'unprivileged user namespaces are disabled ({path} is {value}); start the worker as root instead'
+    return None
+
+
+def run_case(code, stdin, expected, config=None):
+    """Run `code` with `stdin` in a fresh sandbox. Returns (outcome, detail); detail never quotes the output."""
+    config = config or limits()
+    user = pwd.getpwnam(config['RUN_AS'])
+    with tempfile.TemporaryDirectory(prefix='autograde-') as workdir:
+        box, root = os.path.join(workdir, 'box'), os.path.join(workdir, 'root')
+        os.mkdir(box)
+        os.mkdir(root)
+        with open(os.path.join(box, 'answer.py'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        if os.geteuid() == 0:  # Otherwise the worker's own uid is RUN_AS inside the user namespace
+            os.chown(box, user.pw_uid, user.pw_gid)
+        launcher = os.path.join(workdir, 'launcher.py')
+        with open(launcher, 'w', encoding='utf-8') as f:
+            f.write(LAUNCHER)
+        out_path, err_path = os.path.join(workdir, 'stdout'), os.path.join(workdir, 'stderr')
+        args = [
+            sys.executable, '-I', '-S', '-B', launcher, root, box, str(user.pw_uid), str(user.pw_gid),
+            str(config['CPU_SECONDS']), str(config['MEMORY_MB'] * 1024 * 1024), str(config['OUTPUT_KB'] * 1024),
+            str(config['PROCESSES']), os.path.realpath(sys.executable), *_readonly_dirs(),
+        ]
+        with open(out_path, 'wb') as out, open(err_path, 'wb') as err:
+            proc = subprocess.Popen(
+                args, cwd=workdir, stdin=subprocess.PIPE, stdout=out, stderr=err, env={'PATH': '/usr/bin:/bin'},
+                start_new_session=True,  # Own process group, so a timeout kills the launcher and its namespace
+            )
+            try:
+                proc.communicate((stdin or '').encode('utf-8'), timeout=config['WALL_SECONDS'])
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+                return TIMEOUT, f"wall-clock limit ({config['WALL_SECONDS']}s)"
+            except BrokenPipeError:  # Exited without reading stdin
+                proc.wait()
+        with open(out_path, encoding='utf-8', errors='replace') as f:
+            stdout = f.read()
+        with open(err_path, encoding='utf-8', errors='replace') as f:
+            stderr = f.read()
+
+    status = proc.returncode
+    if status == 1 and 'launcher.py' in stderr and 'answer.py' not in stderr:
+        logger.error('Auto-grader sandbox setup failed: %s', stderr.strip().splitlines()[-1])
+        return ERROR, 'sandbox unavailable'
+    if status in (-signal.SIGXCPU, -signal.SIGKILL):
+        return TIMEOUT, f"CPU limit ({config['CPU_SECONDS']}s)"
+    if status == -signal.SIGXFSZ or f'[Errno {errno.EFBIG}]' in stderr:  # Python ignores SIGXFSZ, write() fails
+        return OUTPUT_LIMIT, f"output over {config['OUTPUT_KB']} KB"
+    if 'MemoryError' in stderr:
+        return MEMORY, f"memory limit ({config['MEMORY_MB']} MB)"
+    if status != 0:
+        return ERROR, f'runtime error (exit status {status})'
+    if _normalize(stdout) == _normalize(expected or ''):
+        return PASS, ''
+    return FAIL, 'output mismatch'
+
+
+def plan(submissions):
+    """[(submission, question, case_index, code, case)] for every answered question that has test cases."""
+    answers = {s.id: parse_answers(s.answers) for s in submissions}
+    wanted = {int(qid) for a in answers.values() for qid in a if str(qid).isdigit()}
+    questions = {q.id: q for q in Question.objects.filter(id__in=wanted).exclude(test_cases=[])}
+    runs = []
+    for submission in submissions:
+        for key, code in answers[submission.id].items():
+            question = questions.get(int(key)) if str(key).isdigit() else None
+            if question is None:
+                continue
+            code = str(code or '')
+            for index, case in enumerate(question.test_cases):
+                runs.append((submission, question, index, code, case))
+    return runs
+
+
+def autograde(submissions, workers=None):
+    """Grade `submissions` (assignment loaded) in parallel and save scores/feedback.
+
+    Submissions without any auto-gradable question are left for manual
+    grading. Returns a report dict with counts, timings and throughput.
+    """
+    config = limits()
+    workers = workers or config['WORKERS'] or os.cpu_count() or 1
+    unavailable = sandbox_error(config)
+    if unavailable:
+        logger.error('Auto-grading skipped for %d submissions: %s', len(submissions), unavailable)
+        return {'submissions': 0, 'skipped': len(submissions), 'runs': 0, 'passed': 0, 'timeouts': 0, 'memory': 0,
+                'errors': 0, 'workers': 0, 'run_seconds': 0.0, 'seconds': 0.0, 'submissions_per_minute': 0.0,
+                'unavailable': unavailable}
+    runs = plan(submissions)
+    started = time.perf_counter()
+
+    def execute(run):
+        submission, question, index, code, case = run
+        if not code.strip():
+            return FAIL, 'no answer'
+        return run_case(code, case.get('stdin', ''), case.get('stdout', ''), config)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(execute, runs))
+    run_seconds = time.perf_counter() - started
+
+    per_submission = {}
+    counts = {PASS: 0, FAIL: 0, ERROR: 0, TIMEOUT: 0, MEMORY: 0, OUTPUT_LIMIT: 0}
+    for (submission, question, index, _, _), (outcome, detail) in zip(runs, outcomes):
+        counts[outcome] += 1
+        entry = per_submission.setdefault(submission.id, {'submission': submission, 'passed': 0, 'total': 0, 'lines': {}})
+        entry['total'] += 1
+        entry['passed'] += outcome == PASS
+        line = entry['lines'].setdefault(question.id, [0, 0, []])
+        line[0] += outcome == PASS
+        line[1] += 1
+        if outcome != PASS and len(line[2]) < 3:
+            line[2].append(f'case {index + 1}: {outcome}' + (f' ({detail})' if detail else ''))
+
+    by_teacher = {}
+    for submission_id, entry in per_submission.items():
+        feedback = ['Auto-graded: {passed}/{total} test cases passed.'.format(**entry)]
+        for qid, (passed, total, notes) in entry['lines'].items():
+            feedback.append(f'Q{qid}: {passed}/{total}' + ('; ' + '; '.join(notes) if notes else ''))
+        by_teacher.setdefault(entry['submission'].assignment.created_by_id, []).append({
+            'submission_id': submission_id,
+            'score': round(grading.MAX_SCORE * entry['passed'] / entry['total']),
+            'feedback': '\n'.join(feedback),
+        })
+    teachers = User.objects.in_bulk(by_teacher)
+    for teacher_id, entries in by_teacher.items():
+        grading.apply_grades(teachers[teacher_id], entries)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'submissions': len(per_submission),
+        'skipped': len(submissions) - len(per_submission),
+        'runs': len(runs),
+        'passed': counts[PASS],
+        'timeouts': counts[TIMEOUT],
+        'memory': counts[MEMORY],
+        'errors': counts[ERROR] + counts[OUTPUT_LIMIT],
+        'workers': workers,
+        'run_seconds': run_seconds,
+        'seconds': elapsed,
+        'submissions_per_minute': len(per_submission) / elapsed * 60 if elapsed else 0.0,
+    }
+    _record(report)
+    return report
+
+
+def autograde_ids(submission_ids, workers=None):
+    return autograde(list(Submission.objects.filter(id__in=submission_ids).select_related('assignment')), workers)
+
+
+def _record(report):
+    """Add a run's numbers to the cumulative counters shared by every worker."""
+    values = {name: report.get(name, 0) for name in METRICS}
+    values['busy_ms'] = int(report['seconds'] * 1000)
+    for name, value in values.items():
+        counters.incr(f'autograde:{name}', value)
+    counters.flush()  # Runs are rare and the report is read elsewhere
+
+
+def stats():
+    """Cumulative metrics of every worker."""
+    counts = counters.read(*(f'autograde:{name}' for name in METRICS))
+    totals = {name: counts[f'autograde:{name}'] for name in METRICS}
+    busy = totals['busy_ms'] / 1000
+    totals['submissions_per_minute'] = totals['submissions'] / busy * 60 if busy else 0.0
+    totals['timeout_rate'] = totals['timeouts'] / totals['runs'] if totals['runs'] else 0.0
+    return totals
@@ -0,0 +1,77 @@
+"""Counters summed over every web and worker process, whatever their CACHES backend.
+
+incr() only adds to a per-process buffer; the buffer is written to
+UsageCounter, one UPDATE per counter, at most every FLUSH_SECONDS (by the
+next incr() after that), when a report reads the totals, and at exit. Hot
+paths such as a dashboard cache hit therefore cost no database write, and
+the totals lag by at most FLUSH_SECONDS per process.
+
+Writes always go to the primary database by name, so the replica router
+never sees them: counting a page view doesn't pin the browser to the
+primary (core/routers.py).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, transaction
+from django.db.models import F
+
+from .models import UsageCounter
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 10
+
+_pending = Counter()
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def incr(name, amount=1):
+    global _flushed_at
+    if not amount:
+        return
+    with _lock:
+        _pending[name] += amount
+        due = time.monotonic() - _flushed_at >= FLUSH_SECONDS
+        if due:
+            _flushed_at = time.monotonic()
+    if due:
+        flush()
+
+
+def flush():
+    """Add this process's buffered increments to the stored totals."""
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch:
+        return
+    counters = UsageCounter.objects.using(DEFAULT_DB_ALIAS)
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            counters.bulk_create([UsageCounter(name=name) for name in batch], ignore_conflicts=True)
+            for name, amount in batch.items():
+                counters.filter(name=name).update(value=F('value') + amount)
+    except DatabaseError:
+        logger.warning('Could not store usage counters; keeping them for the next flush', exc_info=True)
+        with _lock:
+            _pending.update(batch)
+
+
+def read(*names):
+    """{name: total over every process}; this process's buffer is flushed first."""
+    flush()
+    totals = dict(UsageCounter.objects.using(DEFAULT_DB_ALIAS).filter(name__in=names).values_list('name', 'value'))
+    return {name: totals.get(name, 0) for name in names}
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Usage counter flush at exit failed')
@@ -0,0 +1,111 @@
+"""Versioned cache of rendered dashboard sections.
+
+Every fragment key embeds the current version token of the user (and, where
+relevant, the subject) it was rendered for. core/signals.py replaces those
+tokens whenever a Submission, Assignment, Enrollment or Assignment.students
+row changes, so stale fragments are never looked up again and simply expire.
+
+The tokens live in the database (VersionToken), not in the cache: every
+process reads the current versions before serving a fragment, so a bump made
+by one worker or management command reaches all of them, and a per-process
+locmem cache is as safe as a shared file or Redis one (it only hits less).
+They are read from the primary, since a lagging replica could still hold the
+version from before a bump.
+
+A fragment built from a read replica (core/routers.py) shortly after a bump
+may predate it, since the replica can lag, so it is only kept until the
+replicas have caught up.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import counters, routers
+from .models import VersionToken
+
+CACHE_ALIAS = 'dashboard'
+# Rendered in place of the per-request CSRF token, swapped back on every hit
+CSRF_PLACEHOLDER = '__dashboard_csrf_token__'
+HITS, MISSES = 'dashboard:hits', 'dashboard:misses'  # UsageCounter names
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_name(kind, pk):
+    return f'dash:{kind}:{pk}'
+
+
+def bump(kind, *pks):
+    """Invalidate every fragment that depends on the given users/subjects ('user' or 'subject')."""
+    pks = {pk for pk in pks if pk is not None}
+    if pks:
+        # Random tokens rather than counters: a version can never come back and match old fragments
+        VersionToken.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            [VersionToken(name=_version_name(kind, pk), token=uuid.uuid4().hex) for pk in sorted(pks)],
+            update_conflicts=True, unique_fields=['name'], update_fields=['token', 'updated_at'],
+        )
+
+
+def _versions(**pks_by_kind):
+    """{(kind, pk): (token, bump time)} in one primary-key lookup; '' for a never bumped user or subject."""
+    names = {_version_name(kind, pk): (kind, pk) for kind, pks in pks_by_kind.items() for pk in pks}
+    found = {
+        names[name]: (token, updated_at.timestamp())
+        for name, token, updated_at in VersionToken.objects.using(DEFAULT_DB_ALIAS).filter(
+            name__in=names,
+        ).values_list('name', 'token', 'updated_at')
+    }
+    return {key: found.get(key, ('', 0)) for key in names.values()}
+
+
+def stats():
+    """Hit/miss counts across all processes."""
+    totals = counters.read(HITS, MISSES)
+    hits, misses = totals[HITS], totals[MISSES]
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0.0}
+
+
+def render_fragment(request, name, template_name, build, subject_id=None):
+    """Return the rendered section `name` for request.user, from cache when still current.
+
+    `build()` runs only on a miss and returns (context, subject_ids, timeout):
+    the template context, extra subjects whose versions the fragment depends on,
+    and an optional TTL (e.g. until the next due date drops an assignment off).
+    """
+    cache = _cache()
+    user_id = request.user.pk
+    versions = _versions(user=[user_id], subject=[subject_id] if subject_id else [])
+    user_version = versions['user', user_id][0]
+    subject_version = versions['subject', subject_id][0] if subject_id else '-'
+    key = f'dash:frag:{name}:{user_id}:{user_version}:{subject_id or "-"}:{subject_version}'
+    entry = cache.get(key)
+    if entry is not None and entry['deps']:
+        current = _versions(subject=entry['deps'].keys())
+        if any(current['subject', pk][0] != token for pk, token in entry['deps'].items()):
+            entry = None
+    if entry is not None:
+        counters.incr(HITS)
+        html = entry['html']
+    else:
+        counters.incr(MISSES)
+        context, subject_ids, timeout = build()
+        dep_versions = _versions(subject=set(subject_ids)) if subject_ids else {}
+        html = render_to_string(template_name, {**context, 'csrf_token': CSRF_PLACEHOLDER}, request)
+        if routers.reading_from_replica():
+            bumped = max(bumped_at for _, bumped_at in [*versions.values(), *dep_versions.values()])
+            settled = bumped + settings.REPLICA_STICKY_SECONDS
+            if settled > time.time():
+                timeout = min(timeout or float('inf'), settled - time.time())
+        kwargs = {} if timeout is None else {'timeout': max(1, int(timeout))}
+        deps = {pk: token for (_, pk), (token, _) in dep_versions.items()}
+        cache.set(key, {'html': html, 'deps': deps}, **kwargs)
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, get_token(request)))
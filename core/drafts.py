@@ -0,0 +1,192 @@
+"""Autosaved drafts for submit_assignment.
+
+The page posts per-question deltas (only the answers that changed) a couple
+of seconds after the student stops typing. Deltas are merged into a
+per-process buffer keyed by (student, assignment); the request returns
+without touching the database. One flusher thread per process writes the
+buffer every FLUSH_SECONDS, or as soon as it holds FLUSH_SIZE drafts, as a
+single transaction of a handful of queries, however many students are
+typing. A deadline rush is a few writes per second instead of one
+transaction per keystroke.
+
+Every answer carries the time it was received; a flush only overwrites an
+answer with a newer one, so batches from different workers can land in
+any order. A reload served by another worker may miss up to FLUSH_SECONDS
+of typing until that worker flushes.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from .models import Assignment, Draft, Submission
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 5
+FLUSH_SIZE = 500
+MAX_ANSWER_CHARS = 100_000
+ACCESS_TTL = 6 * 3600
+
+_pending = {}  # (student_id, assignment_id) -> {question id: (stamp, text)}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # One batch at a time per process
+_due = threading.Event()  # Wakes the flusher early when the buffer is full
+_flusher = None
+
+
+def _access_key(student_id, assignment_id):
+    return f'draft:access:{student_id}:{assignment_id}'
+
+
+def allow(student_id, assignment_id):
+    """Remember that the student may draft this assignment (submit_assignment checked the enrollment)."""
+    cache.set(_access_key(student_id, assignment_id), True, ACCESS_TTL)
+
+
+def may_draft(student, assignment_id):
+    """Cached access check, so an autosave normally costs no query at all."""
+    if cache.get(_access_key(student.id, assignment_id)):
+        return True
+    allowed = Assignment.objects.filter(id=assignment_id, subject__enrollment__student=student).exists() and not (
+        Submission.objects.filter(assignment_id=assignment_id, student=student).exists()
+    )
+    if allowed:
+        allow(student.id, assignment_id)
+    return allowed
+
+
+def save(student_id, assignment_id, deltas):
+    """Buffer {question id: text} for one student's draft; the flusher thread writes it."""
+    stamp = time.time_ns()
+    deltas = {str(qid): str(text)[:MAX_ANSWER_CHARS] for qid, text in deltas.items() if str(qid).isdigit()}
+    if not deltas:
+        return
+    with _lock:
+        entry = _pending.setdefault((student_id, assignment_id), {})
+        entry.update({qid: (stamp, text) for qid, text in deltas.items()})
+        if len(_pending) >= FLUSH_SIZE:
+            _due.set()
+    _start_flusher()
+
+
+def _take(keys=None):
+    with _lock:
+        if keys is None:
+            batch = dict(_pending)
+            _pending.clear()
+        else:
+            batch = {key: _pending.pop(key) for key in keys if key in _pending}
+    return batch
+
+
+def flush():
+    """Write the buffered deltas to Draft in one transaction. Returns the number of drafts written."""
+    with _flush_lock:
+        batch = _take()
+        if not batch:
+            return 0
+        try:
+            return _write(batch)
+        except Exception:
+            # Put the deltas back (newer ones that arrived meanwhile win) for the next round
+            with _lock:
+                for key, entry in batch.items():
+                    merged = _pending.setdefault(key, {})
+                    for qid, value in entry.items():
+                        if qid not in merged or merged[qid][0] < value[0]:
+                            merged[qid] = value
+            raise
+
+
+def _matching(queryset, keys):
+    """Rows of `queryset` for the given (student_id, assignment_id) keys.
+
+    Filters on the two id lists (one OR per key nests too deep for SQLite at
+    batch sizes) and drops the cross-product extras in Python.
+    """
+    keys = set(keys)
+    rows = queryset.filter(
+        student_id__in={s for s, _ in keys}, assignment_id__in={a for _, a in keys},
+    )
+    return [row for row in rows if (row.student_id, row.assignment_id) in keys]
+
+
+def _write(batch):
+    with transaction.atomic():
+        # Submitted meanwhile (possibly through another worker): the draft is obsolete
+        submitted = {
+            (s.student_id, s.assignment_id) for s in _matching(Submission.objects.only('student_id', 'assignment_id'), batch)
+        }
+        batch = {key: entry for key, entry in batch.items() if key not in submitted}
+        if not batch:
+            return 0
+        drafts = {(d.student_id, d.assignment_id): d for d in _matching(Draft.objects.select_for_update(), batch)}
+        missing = [key for key in batch if key not in drafts]
+        if missing:
+            # Empty rows first, then everything goes through the same merge; another worker may create some too
+            Draft.objects.bulk_create([Draft(student_id=s, assignment_id=a) for s, a in missing], ignore_conflicts=True)
+            drafts.update({
+                (d.student_id, d.assignment_id): d for d in _matching(Draft.objects.select_for_update(), missing)
+            })
+        changed = []
+        for key, entry in batch.items():
+            draft = drafts[key]
+            for qid, (stamp, text) in entry.items():
+                if draft.stamps.get(qid, 0) < stamp:
+                    draft.answers[qid] = text
+                    draft.stamps[qid] = stamp
+            changed.append(draft)
+        Draft.objects.bulk_update(changed, ['answers', 'stamps', 'updated_at'])
+    return len(changed)
+
+
+def load(student_id, assignment_id):
+    """{question id: text}: the stored draft with this worker's unflushed deltas on top."""
+    draft = Draft.objects.filter(student_id=student_id, assignment_id=assignment_id).first()
+    answers = dict(draft.answers) if draft else {}
+    with _lock:
+        pending = dict(_pending.get((student_id, assignment_id), {}))
+    for qid, (stamp, text) in pending.items():
+        if draft is None or draft.stamps.get(qid, 0) < stamp:
+            answers[qid] = text
+    return answers
+
+
+def discard(student_id, assignment_id):
+    """Drop the draft once the answers became a Submission."""
+    _take([(student_id, assignment_id)])
+    cache.delete(_access_key(student_id, assignment_id))
+    Draft.objects.filter(student_id=student_id, assignment_id=assignment_id).delete()
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name='draft-flush', daemon=True)
+            _flusher.start()
+
+
+def _flush_periodically():
+    while True:
+        _due.wait(FLUSH_SECONDS)
+        _due.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Draft flush failed; retrying in %ss', FLUSH_SECONDS)  # The deltas were put back
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Draft flush at exit failed')
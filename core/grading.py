@@ -0,0 +1,75 @@
+import math
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import adaptive, dashboard_cache, mastery, stats
+from .models import Submission
+
+MAX_SCORE = 10
+
+
+def parse_score(raw):
+    """'' -> None, otherwise an int clamped to 0..MAX_SCORE. Raises ValueError on junk, inf and nan."""
+    if raw is None or str(raw).strip() == '':
+        return None
+    value = float(raw)
+    if not math.isfinite(value):  # int() would raise OverflowError on inf
+        raise ValueError(f'Score is not a finite number: {raw!r}')
+    return max(0, min(MAX_SCORE, int(value)))
+
+
+def apply_grades(teacher, entries, queue_followups=False):
+    """Grade many submissions at once.
+
+    `entries` is an iterable of dicts with submission_id, score and optional
+    feedback. Submissions are loaded in one query (only the teacher's own),
+    written with one bulk_update in a transaction along with the stats and
+    mastery updates, then all adaptive follow-ups are generated together
+    (or, with queue_followups, left to the background worker). Returns {'graded': [...ids], 'errors': {id: message}, 'followups':
+    {id: (outcome, level)}}.
+    """
+    errors = {}
+    parsed = {}
+    for entry in entries:
+        try:
+            submission_id = int(entry.get('submission_id'))
+        except (TypeError, ValueError):
+            errors[str(entry.get('submission_id'))] = 'Invalid submission id'
+            continue
+        try:
+            score = parse_score(entry.get('score'))
+        except (TypeError, ValueError):
+            errors[submission_id] = 'Invalid score. Enter a number between 0-10.'
+            continue
+        parsed[submission_id] = (score, (entry.get('feedback') or '').strip())
+
+    submissions = list(
+        Submission.objects.filter(id__in=parsed, assignment__created_by=teacher).select_related('assignment')
+    )
+    for missing in set(parsed) - {s.id for s in submissions}:
+        errors[missing] = 'Submission not found'
+
+    changes = []
+    now = timezone.now()
+    for submission in submissions:
+        previous_score = submission.score
+        submission.score, submission.feedback = parsed[submission.id]
+        submission.updated_at = now  # bulk_update skips auto_now
+        changes.append((submission, previous_score))
+
+    with transaction.atomic():
+        Submission.objects.bulk_update(submissions, ['score', 'feedback', 'updated_at'], batch_size=500)
+        stats.record_grades(changes)
+        mastery.record_grades(changes)
+    # bulk_update sends no post_save; invalidate the students' cached dashboards here
+    dashboard_cache.bump('user', *{s.student_id for s in submissions})
+
+    graded = [s for s in submissions if s.score is not None]
+    if queue_followups:
+        from . import tasks  # tasks -> autograder -> grading
+        tasks.enqueue_followups(graded, teacher)
+        followups = {}
+    else:
+        followups = adaptive.generate_followups(graded, teacher)
+    return {'graded': [s.id for s in submissions], 'errors': errors, 'followups': followups}
@@ -0,0 +1,53 @@
+from django.db.models import BooleanField, Case, Exists, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .models import Assignment, Enrollment, Question, Submission
+
+AssignmentStudents = Assignment.students.through
+
+
+def student_inbox(user, subject=None, open_only=False):
+    """Assignments visible to a student, annotated with their submission status.
+
+    One SQL statement: enrollment, targeting, submission and first-question
+    preview are all correlated subqueries, so cost does not grow with the number
+    of adaptive assignments created for classmates. An assignment with students
+    attached is only visible to those students; one without is visible to the
+    whole subject.
+    """
+    now = timezone.now()
+    own_submission = Submission.objects.filter(assignment=OuterRef('pk'), student=user).order_by('-submitted_at')
+    first_question = Question.objects.filter(assignment=OuterRef('pk')).order_by('id')
+
+    assignments = Assignment.objects.filter(
+        # IN rather than a correlated EXISTS, so it is a search of (subject, due_date) instead of a scan
+        subject__in=Enrollment.objects.filter(student=user).values('subject_id'),
+    ).filter(
+        ~Exists(AssignmentStudents.objects.filter(assignment=OuterRef('pk')))
+        | Exists(AssignmentStudents.objects.filter(assignment=OuterRef('pk'), user=user))
+    ).annotate(
+        has_submission=Exists(own_submission),
+        submission_id=Subquery(own_submission.values('id')[:1]),
+        score=Subquery(own_submission.values('score')[:1]),
+        is_overdue=Case(When(due_date__lt=now, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        preview_question=Subquery(first_question.values('question')[:1]),
+        preview_hint=Subquery(first_question.values('hint')[:1]),
+    ).select_related('subject').order_by('due_date')
+
+    if subject is not None:
+        assignments = assignments.filter(subject=subject)
+    if open_only:
+        assignments = assignments.filter(due_date__gt=now)
+    return assignments
+
+
+def attach_inbox_previews(assignments, max_length=50, suffix='...'):
+    """display_question/display_hint from the annotated preview columns (same text as the views' prefetch path)."""
+    for ass in assignments:
+        if ass.preview_question is not None:
+            ass.display_question = f"{ass.preview_question[:max_length]}{suffix}" if ass.preview_question else "No question"
+            ass.display_hint = ass.preview_hint or ""
+        else:
+            ass.display_question = "No question available"
+            ass.display_hint = ""
+    return assignments
@@ -0,0 +1,72 @@
+"""Submission ingest for submit_assignment, built for the rush before a deadline.
+
+A student gets one Submission per assignment, enforced by the unique
+(assignment, student) constraint. The INSERT doubles as the "already
+submitted?" check: a double-click or a retried request hits the constraint
+and gets the stored row back instead of a duplicate. The insert, the stats
+counter, the similarity fingerprints and the auto-grade job are written (and
+the autosaved draft deleted) in one transaction, so a submit costs one
+commit and no re-reads.
+
+Changing the answers afterwards is a resubmission: the stored row is
+updated in place (core.versions keeps the earlier versions as compressed
+deltas) and its grade goes back to pending.
+"""
+import json
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import drafts, similarity, stats, tasks, versions
+from .models import Submission, parse_answers
+
+
+def submit(assignment, student, answers, autograde=False):
+    """Store `answers` ({question id: text}) as the student's submission, once.
+
+    Returns (submission, created); created is False when the student had
+    already submitted, in which case the stored submission is returned
+    unchanged.
+    """
+    submission = Submission(assignment=assignment, student=student, answers=json.dumps(answers))
+    try:
+        with transaction.atomic():
+            submission.save(force_insert=True)
+            stats.record_submission(submission)
+            similarity.index_submissions([submission], replace=False)
+            if autograde:
+                tasks.enqueue_autograde([submission])
+            drafts.discard(student.id, assignment.id)  # The draft became this submission
+    except IntegrityError:
+        existing = Submission.objects.filter(assignment=assignment, student=student).first()
+        if existing is None:  # Not the uniqueness constraint after all
+            raise
+        return existing, False
+    return submission, True
+
+
+def resubmit(submission, answers, autograde=False):
+    """Replace the answers of an existing submission with a new version.
+
+    The grade goes back to pending; the replaced version keeps it in the
+    history. Returns (submission, changed); identical answers (a repeated
+    click) change nothing.
+    """
+    with transaction.atomic():
+        submission = Submission.objects.select_for_update().get(pk=submission.pk)
+        if parse_answers(submission.answers) == answers:
+            return submission, False
+        previous_score = submission.score
+        now = timezone.now()
+        versions.record(submission, answers, now)
+        submission.answers = json.dumps(answers)
+        submission.submitted_at = now
+        submission.score = None
+        submission.feedback = ''
+        submission.save(update_fields=['answers', 'version', 'submitted_at', 'score', 'feedback'])
+        stats.record_grade(submission, previous_score)
+        similarity.index_submissions([submission])
+        if autograde:
+            tasks.enqueue_autograde([submission])
+        drafts.discard(submission.student_id, submission.assignment_id)
+    return submission, True
@@ -0,0 +1,166 @@
+"""Database-backed background jobs, no broker needed.
+
+enqueue() inserts a Job row; `manage.py run_worker` claims due rows and runs
+the registered handler for each. Claiming is one conditional UPDATE
+(status='queued' -> 'running', stamped with a per-claim token), so it is safe
+on SQLite, which has no SELECT ... FOR UPDATE, as well as on Postgres: two
+workers can race for the same ids but only one UPDATE matches each row.
+Failed jobs are retried with exponential backoff until max_attempts. The
+claim itself counts the attempt, so a job that takes its worker down with it
+(OOM, segfault, kill -9) still uses one up. While a job runs, a heartbeat
+thread renews its lease; a job whose worker died stops being renewed and,
+once the lease expires, is re-queued, or failed if that was its last attempt.
+Every write after the claim is conditional on the claim token, so a worker
+that lost its lease can't overwrite the outcome of the one that took the job
+over.
+"""
+import logging
+import random
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 5        # seconds; attempt n waits about BACKOFF_BASE * 2**(n-1)
+BACKOFF_MAX = 3600
+LEASE = timedelta(minutes=10)  # A running job not renewed for this long is assumed orphaned
+HEARTBEAT = LEASE.total_seconds() / 4  # Seconds between lease renewals while a job runs
+
+_handlers = {}
+
+
+def handler(kind):
+    """Register `func(payload)` as the handler for jobs of this kind."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, delay=0, max_attempts=5):
+    """Queue a job to run after the current transaction commits.
+
+    With settings.JOBS_EAGER the job runs inline instead (development/tests
+    without a worker).
+    """
+    if kind not in _handlers:
+        raise ValueError(f'No job handler registered for {kind!r}')
+    job = Job.objects.create(
+        kind=kind, payload=payload or {}, max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: [run(claimed) for claimed in claim_ids([job.id], new_token())])
+    return job
+
+
+def new_token():
+    return uuid.uuid4().hex
+
+
+def release_expired(now=None):
+    """Re-queue running jobs whose worker stopped renewing them (crash, kill -9). Returns the number re-queued.
+
+    A job that already used its last attempt is failed instead: it may well be
+    what killed the worker, and would take the next one down too.
+    """
+    now = now or timezone.now()
+    expired = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - LEASE)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_at=None, finished_at=now,
+        last_error=f'Lease expired on the last attempt: the worker stopped renewing it for {LEASE}',
+    )
+    if failed:
+        logger.error('%s expired jobs failed permanently after their last attempt', failed)
+    return expired.update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def claim_ids(ids, token, now=None):
+    now = now or timezone.now()
+    Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(id__in=ids, locked_by=token, status=Job.RUNNING))
+
+
+def claim(limit, token=None, now=None):
+    """Atomically take up to `limit` due jobs; returns the Job rows this caller now owns."""
+    now = now or timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+    return claim_ids(candidates, token or new_token(), now)
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def renew(job, now=None):
+    """Extend the lease of a job this worker still owns; False if it was released and maybe re-claimed."""
+    return bool(Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+        locked_at=now or timezone.now(),
+    ))
+
+
+def _heartbeat(job, stop):
+    try:
+        while not stop.wait(HEARTBEAT):
+            if not renew(job):
+                logger.warning('Job %s lost its lease while running', job)
+                return
+    finally:
+        connection.close()  # This thread's own connection
+
+
+def run(job):
+    """Execute one claimed job and record the outcome, unless it lost its lease meanwhile. Never raises."""
+    token = job.locked_by
+    # Claimed jobs can wait in the worker's pool; one that expired there belongs to someone else now
+    if not renew(job):
+        logger.warning('Job %s lost its lease before it started; skipped', job)
+        return job
+    func = _handlers.get(job.kind)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job, stop), daemon=True)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise LookupError(f'No job handler registered for {job.kind!r}')
+        func(job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()[-4000:]
+        now = timezone.now()
+        if job.attempts >= job.max_attempts or func is None:
+            job.status = Job.FAILED
+            job.finished_at = now
+            logger.error('Job %s failed permanently after %s attempts', job, job.attempts)
+        else:
+            job.status = Job.QUEUED
+            job.run_at = now + backoff(job.attempts)
+            logger.warning('Job %s failed (attempt %s), retrying at %s', job, job.attempts, job.run_at)
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+        job.last_error = ''
+    finally:
+        stop.set()
+        heartbeat.join()
+    job.locked_by = ''
+    job.locked_at = None
+    fields = ['status', 'attempts', 'run_at', 'last_error', 'finished_at', 'locked_by', 'locked_at']
+    if not Job.objects.filter(pk=job.pk, locked_by=token).update(**{field: getattr(job, field) for field in fields}):
+        logger.warning('Job %s lost its lease while running; outcome %s discarded', job, job.status)
+    return job
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import autograder
+from core.models import Submission
+
+
+class Command(BaseCommand):
+    help = 'Auto-grade submissions against Question.test_cases in the sandbox and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignment',
+            type=int,
+            action='append',
+            help='Only these assignment ids (repeatable; default: all)',
+        )
+        parser.add_argument(
+            '--regrade',
+            action='store_true',
+            help='Also re-run submissions that already have a score',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Concurrent sandboxes (default: AUTOGRADER["WORKERS"] or the CPU count)',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Only print the cumulative auto-grader metrics',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            totals = autograder.stats()
+            self.stdout.write(
+                f"Auto-grader: {totals['submissions']} submissions, {totals['runs']} runs, "
+                f"{totals['passed']} passed, {totals['timeouts']} timeouts ({totals['timeout_rate']:.1%}), "
+                f"{totals['memory']} memory, {totals['errors']} errors, "
+                f"{totals['submissions_per_minute']:,.0f} submissions/min"
+            )
+            return
+
+        submissions = Submission.objects.select_related('assignment')
+        if options['assignment']:
+            submissions = submissions.filter(assignment_id__in=options['assignment'])
+        if not options['regrade']:
+            submissions = submissions.filter(score__isnull=True)
+        report = autograder.autograde(list(submissions), workers=options['workers'])
+        if report.get('unavailable'):
+            raise CommandError(f"Sandbox unavailable, {report['skipped']} submissions left ungraded: "
+                               f"{report['unavailable']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Auto-graded {report['submissions']} submissions ({report['skipped']} without test cases) "
+            f"with {report['workers']} workers: {report['runs']} runs, {report['passed']} passed, "
+            f"{report['timeouts']} timeouts, {report['memory']} memory, {report['errors']} errors "
+            f"in {report['seconds']:.2f}s ({report['submissions_per_minute']:,.0f} submissions/min)"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core import dashboard_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counts for the dashboard fragment cache'
+
+    def handle(self, *args, **options):
+        stats = dashboard_cache.stats()
+        self.stdout.write(
+            f"Dashboard cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"(hit ratio {stats['hit_ratio']:.1%})"
+        )
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+import os
+import re
+import subprocess
+import sys
+
+RESULT_RE = re.compile(r'^(\w+): (\d+) requests in [\d.]+s: ([\d,]+) req/s, p50 (\d+) ms, p95 (\d+) ms, (\d+) failed$')
+
+
+class Command(BaseCommand):
+    help = ('Compare the database profiles (DB_PROFILE=default vs production, see settings.DATABASES) under '
+            'concurrent submits and dashboard reads. Each profile runs submit_benchmark in a fresh process.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Students submitting (default: 300)')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients (default: 8)')
+        parser.add_argument('--dashboard', type=int, default=3,
+                            help='student_dashboard loads per student after submitting (default: 3)')
+
+    def handle(self, *args, **options):
+        original = self.journal_mode()
+        connection.close()  # Leaving WAL needs every other connection to the file closed
+        results = {}
+        try:
+            for profile in ('default', 'production'):
+                command = [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'submit_benchmark', '--double',
+                    '--students', str(options['students']), '--threads', str(options['threads']),
+                    '--dashboard', str(options['dashboard']),
+                ]
+                if profile == 'default' and connection.vendor == 'sqlite':
+                    # The journal mode lives in the file: undo what an earlier production run left behind
+                    command += ['--journal-mode', 'delete']
+                self.stdout.write(self.style.MIGRATE_HEADING(f'DB_PROFILE={profile}'))
+                run = subprocess.run(command, env={**os.environ, 'DB_PROFILE': profile},
+                                     capture_output=True, text=True)
+                self.stdout.write(run.stdout.rstrip())
+                if run.returncode:
+                    self.stderr.write(run.stderr.rstrip())
+                    continue
+                results[profile] = {
+                    m[1]: m.groups()[2:] for m in map(RESULT_RE.match, run.stdout.splitlines()) if m
+                }
+        finally:
+            if original and original != self.journal_mode():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'PRAGMA journal_mode={original}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Comparison'))
+        self.stdout.write(f'{"":<20}{"profile":<12}{"req/s":>8}{"p50 ms":>8}{"p95 ms":>8}{"failed":>8}')
+        for name in ('submit_assignment', 'student_dashboard'):
+            for profile, rows in results.items():
+                if name in rows:
+                    self.stdout.write(f'{name:<20}{profile:<12}' + ''.join(f'{value:>8}' for value in rows[name]))
+
+    def journal_mode(self):
+        if connection.vendor != 'sqlite':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
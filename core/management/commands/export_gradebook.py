@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.export import CONTENT_TYPES, EXPORT_CHUNK_SIZE, iter_gradebook
+from core.models import Subject
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = 'Stream a subject gradebook as CSV or NDJSON (constant memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('subject', help='Subject id or code')
+        parser.add_argument('--format', choices=sorted(CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        ref = options['subject']
+        subject = Subject.objects.filter(id=int(ref)).first() if ref.isdigit() else None
+        subject = subject or Subject.objects.filter(code=ref).first()
+        if subject is None:
+            raise CommandError(f'Subject {ref!r} not found')
+
+        started = time.perf_counter()
+        lines = 0
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in iter_gradebook(subject, options['format'], chunk_size=max(1, options['chunk_size'])):
+                out.write(chunk)
+                lines += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['output']:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(f'Wrote {lines} lines to {options["output"]} in {elapsed:.2f}s'))
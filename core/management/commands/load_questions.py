@@ -1,11 +1,19 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from core.models import Question
+from django.db import transaction
+from core.adaptive import invalidate_question_pools
+from core.models import Question, Subject
+from itertools import islice
 import csv
 import os
+import time
+
+EXPECTED_HEADERS = ['subject', 'topic', 'level', 'question', 'hint']
+LEVEL_MAP = {'low': 'low', 'medium': 'medium', 'moderate': 'medium', 'high': 'high'}
+
 
 class Command(BaseCommand):
-    help = 'Load questions from CSV into Question model'
+    help = 'Load questions from CSV into Question model (streaming bulk upsert or delta sync)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -19,67 +27,177 @@ class Command(BaseCommand):
             default='questions.csv',
             help='Path to CSV file (default: questions.csv)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per upsert statement/transaction (default: 2000)',
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Delta sync against the content-hash manifest: only write new/changed rows',
+        )
+        parser.add_argument(
+            '--retire',
+            action='store_true',
+            help='With --sync, retire questions that are no longer in the CSV (assignment links are kept)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='With --sync, print the pending changes without writing anything',
+        )
 
     def handle(self, *args, **options):
         csv_path = options['csv_path']
+        self.batch_size = max(1, options['batch_size'])
         full_path = os.path.join(settings.BASE_DIR, csv_path)
         if not os.path.exists(full_path):
             self.stdout.write(self.style.ERROR(f"CSV not found at {full_path}"))
             return
+        if options['sync'] and options['clear']:
+            raise CommandError('--sync and --clear are mutually exclusive')
+        if (options['retire'] or options['dry_run']) and not options['sync']:
+            raise CommandError('--retire and --dry-run require --sync')
 
         if options['clear']:
             Question.objects.all().delete()
             self.stdout.write(self.style.WARNING('Cleared existing questions'))
 
-        loaded_count = 0
-        topic_counts = {}
-        unknown_levels = set()
+        # One query: subject name -> [ids]. Subjects are per teacher, so a name can map to several.
+        self.subject_ids = {}
+        for subject_id, name in Subject.objects.values_list('id', 'name'):
+            self.subject_ids.setdefault(name.strip(), []).append(subject_id)
+        self.unknown_levels = set()
+        self.unknown_subjects = set()
+        self.rows_read = 0
 
-        with open(full_path, 'r', encoding='utf-8') as file:
+        started = time.perf_counter()
+        with open(full_path, 'r', encoding='utf-8', newline='') as file:
             reader = csv.DictReader(file)
-            expected_headers = ['subject', 'topic', 'level', 'question', 'hint']
-            if not all(h in reader.fieldnames for h in expected_headers):
-                self.stdout.write(self.style.ERROR(f"CSV missing headers: {set(expected_headers) - set(reader.fieldnames)}"))
+            missing = set(EXPECTED_HEADERS) - set(reader.fieldnames or [])
+            if missing:
+                self.stdout.write(self.style.ERROR(f"CSV missing headers: {missing}"))
                 return
+            if options['sync']:
+                self.sync(reader, retire=options['retire'], dry_run=options['dry_run'])
+            else:
+                self.upsert(reader)
+        elapsed = time.perf_counter() - started
+        # Bulk writes send no Question signals; drop the workers' cached adaptive question pools
+        invalidate_question_pools()
 
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    # Fixed normalization
-                    level_raw = row['level'].strip().lower()
-                    level_map = {'low': 'Low', 'moderate': 'Moderate', 'high': 'High'}
-                    level = level_map.get(level_raw, 'Low')
-                    if level == 'Low' and level_raw not in level_map:
-                        unknown_levels.add(level_raw)
-
-                    q, created = Question.objects.get_or_create(
-                        topic=row['topic'].strip(),
-                        question_text=row['question'].strip(),
-                        defaults={
-                            'subject': row.get('subject', '').strip(),
-                            'level': level,
-                            'hint': row['hint'].strip(),
-                        }
-                    )
+        if self.unknown_subjects:
+            self.stdout.write(self.style.WARNING(f"Skipped rows for unknown subjects: {sorted(self.unknown_subjects)}"))
+        if self.unknown_levels:
+            self.stdout.write(self.style.WARNING(f"Unknown levels defaulted to 'low': {sorted(self.unknown_levels)}"))
 
-                    if created:
-                        loaded_count += 1
-                        topic = q.topic
-                        topic_counts[topic] = topic_counts.get(topic, 0) + 1
+        rate = self.rows_read / elapsed if elapsed else 0
+        self.stdout.write(f'Read {self.rows_read} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec, batch size {self.batch_size})')
 
-                except KeyError as e:
-                    self.stdout.write(self.style.ERROR(f"Row {row_num}: Missing column '{e}'"))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Row {row_num}: Error: {e}"))
+    def iter_chunks(self, reader):
+        """Yield {(subject_id, topic, question): Question} per CSV chunk, deduped on the natural key."""
+        while True:
+            chunk = list(islice(reader, self.batch_size))
+            if not chunk:
+                return
+            self.rows_read += len(chunk)
+            batch = {}
+            for row in chunk:
+                subject_name = (row['subject'] or '').strip()
+                topic = (row['topic'] or '').strip()
+                text = (row['question'] or '').strip()
+                if not topic or not text:
+                    continue
+                ids = self.subject_ids.get(subject_name)
+                if not ids:
+                    self.unknown_subjects.add(subject_name)
+                    continue
+                level_raw = (row['level'] or '').strip().lower()
+                level = LEVEL_MAP.get(level_raw)
+                if level is None:
+                    self.unknown_levels.add(level_raw)
+                    level = 'low'
+                hint = (row['hint'] or '').strip()
+                content_hash = Question.compute_content_hash(level, hint)
+                for subject_id in ids:
+                    batch[(subject_id, topic, text)] = Question(
+                        subject_id=subject_id, topic=topic, level=level, question=text,
+                        hint=hint, content_hash=content_hash, difficulty=Question.initial_difficulty(level),
+                    )
+            if batch:
+                yield batch
 
-        if unknown_levels:
-            self.stdout.write(self.style.WARNING(f"Unknown levels defaulted to 'Low': {sorted(unknown_levels)}"))
+    def upsert(self, reader):
+        upserted = 0
+        topic_counts = {}
+        for batch in self.iter_chunks(reader):
+            with transaction.atomic():
+                Question.objects.bulk_create(
+                    batch.values(),
+                    batch_size=self.batch_size,
+                    update_conflicts=True,
+                    unique_fields=['subject', 'topic', 'question'],
+                    update_fields=['level', 'hint', 'content_hash', 'is_retired'],
+                )
+            upserted += len(batch)
+            for _, topic, _ in batch:
+                topic_counts[topic] = topic_counts.get(topic, 0) + 1
 
         if topic_counts:
             sorted_topics = dict(sorted(topic_counts.items(), key=lambda x: x[1], reverse=True))
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Loaded {loaded_count} new questions across {len(sorted_topics)} topics: {sorted_topics}'
+                    f'Upserted {upserted} questions across {len(sorted_topics)} topics: {sorted_topics}'
                 )
             )
         else:
-            self.stdout.write(self.style.WARNING('No questions loaded.'))
\ No newline at end of file
+            self.stdout.write(self.style.WARNING('No questions loaded.'))
+
+    def sync(self, reader, retire=False, dry_run=False):
+        # Manifest: natural key -> (id, content_hash, is_retired), read in one query
+        manifest = {
+            (subject_id, topic, text): (pk, content_hash, is_retired)
+            for pk, subject_id, topic, text, content_hash, is_retired in Question.objects.filter(
+                subject__isnull=False
+            ).values_list('id', 'subject_id', 'topic', 'question', 'content_hash', 'is_retired').iterator()
+        }
+        to_create = []
+        to_update = []
+        seen = set()
+        for batch in self.iter_chunks(reader):
+            for key, obj in batch.items():
+                seen.add(key)
+                entry = manifest.get(key)
+                if entry is None:
+                    to_create.append(obj)
+                elif entry[1] != obj.content_hash or entry[2]:
+                    obj.id = entry[0]
+                    to_update.append(obj)
+        to_retire = [] if not retire else [
+            pk for key, (pk, _, is_retired) in manifest.items() if key not in seen and not is_retired
+        ]
+        removed = sum(1 for key, entry in manifest.items() if key not in seen and not entry[2])
+
+        summary = (
+            f'{len(to_create)} new, {len(to_update)} changed, {removed} removed from CSV'
+            f' ({len(to_retire)} to retire), {len(seen) - len(to_update) - len(to_create)} unchanged'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Dry run: {summary}'))
+            for label, objs in (('+', to_create), ('~', to_update)):
+                for obj in objs[:10]:
+                    self.stdout.write(f'  {label} [{obj.topic}/{obj.level}] {obj.question[:60]}')
+            return
+
+        with transaction.atomic():
+            Question.objects.bulk_create(to_create, batch_size=self.batch_size)
+            for obj in to_update:
+                obj.is_retired = False
+            Question.objects.bulk_update(
+                to_update, ['level', 'hint', 'content_hash', 'is_retired'], batch_size=self.batch_size,
+            )
+            for start in range(0, len(to_retire), self.batch_size):
+                Question.objects.filter(id__in=to_retire[start:start + self.batch_size]).update(is_retired=True)
+        self.stdout.write(self.style.SUCCESS(f'Synced: {summary}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core import question_bank
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss/reload counts of the questions.csv index, summed over every process'
+
+    def handle(self, *args, **options):
+        stats = question_bank.totals()
+        self.stdout.write(
+            f"Question bank: {stats['hits']} hits, {stats['misses']} misses "
+            f"(hit ratio {stats['hit_ratio']:.1%}), {stats['reloads']} reloads"
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core import stats
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized AssignmentStats from Submission (backfill or repair)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignment',
+            type=int,
+            action='append',
+            help='Only rebuild these assignment ids (repeatable; default: all)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = stats.rebuild(options['assignment'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {written} assignments in {elapsed:.2f}s'))
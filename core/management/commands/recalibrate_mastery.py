@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import mastery
+from core.adaptive import invalidate_question_pools
+import time
+
+
+class Command(BaseCommand):
+    help = 'Refit student topic mastery and question difficulty from all graded submissions (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=30,
+            help='Alternating fit passes over the score matrix (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        if mastery.np is None:
+            raise CommandError('recalibrate_mastery requires NumPy (pip install numpy)')
+        started = time.perf_counter()
+        masteries, questions, observations = mastery.recalibrate(max(1, options['iterations']))
+        # Difficulties moved; workers re-sort their adaptive question pools on next use
+        invalidate_question_pools()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Recalibrated {masteries} masteries and {questions} questions from {observations} graded submissions'
+            f' in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,167 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core import similarity
+from core.models import Assignment, Subject, Submission, User
+import difflib
+import json
+import random
+import re
+import time
+
+NAMES = ['total', 'count', 'value', 'x', 'y', 'n', 'items', 'result', 'temp', 'data', 'num', 'acc',
+         'first', 'second', 'word', 'text', 'flag', 'idx', 'k', 'score', 'nums', 'out', 'left', 'right']
+WORDS = ['hello', 'python', 'loop', 'answer', 'level', 'data', 'world', 'code']
+OPS = ['+', '-', '*', '//', '%']
+CALLS = ['abs', 'len', 'min', 'max', 'int', 'str', 'sum', 'round']
+NAME_RE = re.compile(r'\b[a-z_][a-z_0-9]*\b')
+KEEP = set(CALLS) | {'print', 'input', 'range', 'for', 'in', 'if', 'else', 'elif', 'while', 'def', 'return',
+                     'and', 'or', 'not', 'append', 'split', 'True', 'False'}
+
+
+def _expr(rng, names, depth=0):
+    roll = rng.random()
+    if depth >= 2 or roll < 0.3:
+        return rng.choice(names) if rng.random() < 0.6 else str(rng.randint(0, 99))
+    if roll < 0.45:
+        return f'{rng.choice(CALLS)}({_expr(rng, names, depth + 1)})'
+    if roll < 0.55:
+        return f'({_expr(rng, names, depth + 1)})'
+    return f'{_expr(rng, names, depth + 1)} {rng.choice(OPS)} {_expr(rng, names, depth + 1)}'
+
+
+def _block(rng, names, indent=0, depth=0):
+    """A few random statements; structure (not just names) varies, as it does between students."""
+    pad = '    ' * indent
+    lines = []
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.random()
+        target = rng.choice(names)
+        if depth < 2 and kind < 0.15:
+            lines.append(f'{pad}for {rng.choice(names)} in range({_expr(rng, names, 1)}):')
+            lines.extend(_block(rng, names, indent + 1, depth + 1))
+        elif depth < 2 and kind < 0.3:
+            lines.append(f'{pad}if {_expr(rng, names, 1)} {rng.choice(["<", ">", "==", "!="])} {_expr(rng, names, 1)}:')
+            lines.extend(_block(rng, names, indent + 1, depth + 1))
+            if rng.random() < 0.5:
+                lines.append(f'{pad}else:')
+                lines.extend(_block(rng, names, indent + 1, depth + 1))
+        elif kind < 0.4:
+            lines.append(f'{pad}print({_expr(rng, names)}, "{rng.choice(WORDS)}")')
+        elif kind < 0.48:
+            lines.append(f'{pad}{target} = int(input())')
+        elif kind < 0.56:
+            lines.append(f'{pad}{target} = [{_expr(rng, names, 1)} for {rng.choice(names)} in range({rng.randint(2, 9)})]')
+        else:
+            lines.append(f'{pad}{target} {rng.choice(["=", "+=", "-=", "*="])} {_expr(rng, names)}')
+    return lines
+
+
+def _program(rng):
+    names = rng.sample(NAMES, 5)
+    lines = [f'{name} = {rng.randint(0, 9)}' for name in names]
+    for _ in range(rng.randint(4, 8)):
+        lines.extend(_block(rng, names))
+    return '\n'.join(lines) + '\n'
+
+
+def _disguise(source, rng):
+    """What a copier does: rename every variable, change numbers, add comments and blank lines."""
+    renames = {}
+
+    def rename(match):
+        word = match.group(0)
+        if word in KEEP:
+            return word
+        return renames.setdefault(word, f'{rng.choice(NAMES)}_{len(renames)}')
+
+    lines = []
+    for line in source.splitlines():
+        line = re.sub(r'\b\d+\b', lambda m: str(int(m.group(0)) + rng.randint(1, 5)), NAME_RE.sub(rename, line))
+        if rng.random() < 0.15:
+            line += '  # ' + rng.choice(WORDS)
+        lines.append(line)
+        if rng.random() < 0.2:
+            lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the winnowing similarity index on synthetic submissions against pairwise diffing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=10000, help='Synthetic answers (default: 10000)')
+        parser.add_argument('--copies', type=int, default=100, help='Planted disguised copies (default: 100)')
+        parser.add_argument('--naive-sample', type=int, default=200,
+                            help='Answers diffed pairwise with difflib to extrapolate the O(n²) cost (default: 200)')
+        parser.add_argument('--db', action='store_true',
+                            help='Also write the fingerprints and run the report through the database (rolled back)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        n, copies = options['submissions'], min(options['copies'], options['submissions'] // 2)
+        sources = [_program(rng) for _ in range(n - copies)]
+        planted = set()
+        for _ in range(copies):
+            original = rng.randrange(len(sources))
+            planted.add((original, len(sources)))
+            sources.append(_disguise(sources[original], rng))
+        self.stdout.write(f'{n} synthetic answers, {copies} planted copies')
+
+        started = time.perf_counter()
+        docs = {(1, i): similarity.fingerprints(source) for i, source in enumerate(sources)}
+        fingerprint_s = time.perf_counter() - started
+        total = sum(len(h) for h in docs.values())
+        self.stdout.write(f'Fingerprinting: {fingerprint_s:.2f}s ({n / fingerprint_s:,.0f} answers/s, '
+                          f'{total / n:.1f} fingerprints/answer)')
+
+        started = time.perf_counter()
+        ranked = similarity.rank_pairs(docs, limit=copies * 2)
+        rank_s = time.perf_counter() - started
+        found = {(a[1], b[1]) for _, _, a, b in ranked[:copies]}
+        recall = len(found & planted) / len(planted) if planted else 1.0
+        self.stdout.write(f'Ranking all pairs via inverted index: {rank_s:.2f}s; '
+                          f'planted copies in top {copies}: {recall:.0%}')
+
+        sample = sources[:options['naive_sample']]
+        pairs = len(sample) * (len(sample) - 1) // 2
+        started = time.perf_counter()
+        for i, a in enumerate(sample):
+            for b in sample[i + 1:]:
+                difflib.SequenceMatcher(None, a, b).ratio()
+        naive_s = time.perf_counter() - started
+        full_pairs = n * (n - 1) // 2
+        if pairs:
+            self.stdout.write(f'Pairwise difflib: {pairs:,} pairs in {naive_s:.2f}s -> '
+                              f'~{naive_s / pairs * full_pairs / 60:,.0f} min for all {full_pairs:,} pairs')
+
+        if options['db']:
+            self.benchmark_db(sources, copies)
+
+    def benchmark_db(self, sources, copies):
+        with transaction.atomic():
+            teacher = User.objects.create(username='similarity-benchmark', email='bench@example.invalid', role='teacher')
+            subject = Subject.objects.create(name='Similarity benchmark', teacher=teacher)
+            assignment = Assignment.objects.create(
+                subject=subject, topic='Benchmark', description='', announcement_date=timezone.now(),
+                due_date=timezone.now(), created_by=teacher,
+            )
+            students = User.objects.bulk_create([
+                User(username=f'similarity-bench-{i}', email=f'bench-{i}@example.invalid') for i in range(len(sources))
+            ])
+            submissions = Submission.objects.bulk_create([
+                Submission(assignment=assignment, student=student, answers=json.dumps({'1': source}),
+                           has_content=True, answered_count=1)
+                for student, source in zip(students, sources)
+            ], batch_size=1000)
+
+            started = time.perf_counter()
+            rows = similarity.index_submissions(submissions)
+            index_s = time.perf_counter() - started
+            started = time.perf_counter()
+            report = similarity.assignment_report(assignment, limit=copies)
+            report_s = time.perf_counter() - started
+            self.stdout.write(f'Database: indexed {rows:,} fingerprints in {index_s:.2f}s; '
+                              f'report of top {len(report)} pairs in {report_s:.2f}s')
+            transaction.set_rollback(True)
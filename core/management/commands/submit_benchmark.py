@@ -0,0 +1,143 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from core.models import Assignment, Enrollment, Question, Subject, Submission, User
+import queue
+import statistics
+import threading
+import time
+
+
+class Command(BaseCommand):
+    help = ('Measure sustained submits/sec through submit_assignment: many students posting at once, '
+            'optionally each one twice (double-click), then optionally student_dashboard requests/sec. '
+            'Creates its own data and deletes it afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Students submitting (default: 300)')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients (default: 8)')
+        parser.add_argument('--questions', type=int, default=3, help='Questions on the assignment (default: 3)')
+        parser.add_argument('--double', action='store_true', help='Post every submission twice, concurrently')
+        parser.add_argument('--dashboard', type=int, default=0, metavar='N',
+                            help='Then load student_dashboard N times per student (default: 0, skip)')
+        parser.add_argument('--journal-mode', choices=['delete', 'wal'],
+                            help='SQLite only: switch the database file to this journal mode first (persists in the file)')
+
+    def handle(self, *args, **options):
+        if options['journal_mode'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={options['journal_mode']}")
+        self.stdout.write(f'{connection.vendor} ({self.journal_mode()}), {options["threads"]} threads, '
+                          f'{options["students"]} students' + (', double submits' if options['double'] else ''))
+        if settings.DEBUG:
+            self.stdout.write(self.style.WARNING('DEBUG is on: every query is logged, numbers are pessimistic'))
+
+        teacher, students, assignment = self.setup(options['students'], options['questions'])
+        try:
+            self.run(students, assignment, options)
+        finally:
+            Submission.objects.filter(assignment=assignment).delete()
+            User.objects.filter(id__in=[s.id for s in students]).delete()
+            teacher.delete()  # Cascades to the subject, its questions and the assignment
+
+    def journal_mode(self):
+        if connection.vendor != 'sqlite':
+            return 'n/a'
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
+
+    def setup(self, count, question_count):
+        stamp = int(time.time())
+        teacher = User.objects.create(username=f'submit-bench-{stamp}', email=f'submit-bench-{stamp}@example.invalid',
+                                      role='teacher')
+        subject = Subject.objects.create(name=f'Submit benchmark {stamp}', teacher=teacher)
+        questions = Question.objects.bulk_create([
+            Question(subject=subject, topic='Benchmark', question=f'Question {i}') for i in range(question_count)
+        ])
+        assignment = Assignment.objects.create(
+            subject=subject, topic='Benchmark', description='', announcement_date=timezone.now(),
+            due_date=timezone.now() + timedelta(minutes=5), created_by=teacher,
+        )
+        assignment.questions.set(questions)
+        students = User.objects.bulk_create([
+            User(username=f'submit-bench-{stamp}-{i}', email=f'submit-bench-{stamp}-{i}@example.invalid')
+            for i in range(count)
+        ])
+        Enrollment.objects.bulk_create([Enrollment(subject=subject, student=s) for s in students])
+        return teacher, students, assignment
+
+    def run(self, students, assignment, options):
+        url = reverse('core:submit_assignment', args=[assignment.id])
+        questions = list(assignment.questions.values_list('id', flat=True))
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+
+        def client_for(student):
+            # Outside INTERNAL_IPS so the debug toolbar stays out of the timings; errors count as failed requests
+            client = Client(HTTP_HOST=host, REMOTE_ADDR='192.0.2.1', raise_request_exception=False)
+            client.force_login(student)
+            return client
+
+        clients = [client_for(student) for student in students]
+        posts = []
+        for i, client in enumerate(clients):
+            data = {f'answers_{qid}': f'print({i} * {qid})  # student {i}' for qid in questions}
+            posts.append((client, data))
+            if options['double']:
+                # A double-click is two requests racing each other; the second gets its own client (cookie jar)
+                posts.append((client_for(students[i]), data))
+        self.report('submit_assignment', self.hammer(
+            [lambda client=client, data=data: client.post(url, data) for client, data in posts], options['threads'],
+        ))
+        stored = Submission.objects.filter(assignment=assignment).count()
+        style = self.style.SUCCESS if stored == len(students) else self.style.ERROR
+        self.stdout.write(style(f'{stored} submissions stored for {len(students)} students'))
+
+        if options['dashboard']:
+            dashboard = reverse('core:student_dashboard')
+            self.report('student_dashboard', self.hammer(
+                [lambda client=client: client.get(dashboard) for client in clients for _ in range(options['dashboard'])],
+                options['threads'],
+            ))
+
+    def hammer(self, requests, threads):
+        """Run the request callables on `threads` threads. Returns (elapsed seconds, [(seconds, status)])."""
+        work = queue.Queue()
+        for request in requests:
+            work.put(request)
+        results = []
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        request = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    started = time.perf_counter()
+                    response = request()
+                    results.append((time.perf_counter() - started, response.status_code))
+            finally:
+                connections.close_all()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return time.perf_counter() - started, results
+
+    def report(self, name, outcome):
+        elapsed, results = outcome
+        latencies = sorted(seconds for seconds, _ in results)
+        failures = sum(1 for _, status in results if status != 200)
+        self.stdout.write(
+            f'{name}: {len(results)} requests in {elapsed:.2f}s: {len(results) / elapsed:,.0f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:.0f} ms, '
+            f'p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000:.0f} ms, {failures} failed'
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from core.routers import replica_aliases
+import sqlite3
+import time
+
+
+class Command(BaseCommand):
+    help = ('Copy the SQLite primary into every SQLite replica (settings.DATABASE_REPLICAS), standing in for '
+            'replication when developing locally. Until the next run, the replicas lag behind the primary.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, metavar='SECONDS',
+                            help='Keep copying at this interval instead of once')
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        replicas = [connections[alias] for alias in replica_aliases()]
+        if not replicas:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS=sqlite:////path/to/replica.sqlite3')
+        if primary.vendor != 'sqlite' or any(replica.vendor != 'sqlite' for replica in replicas):
+            raise CommandError('sync_replica only copies SQLite files; use real replication for other databases')
+        while True:
+            for replica in replicas:
+                started = time.perf_counter()
+                replica.close()  # The copy replaces the file's content under any open connection
+                source = sqlite3.connect(primary.settings_dict['NAME'])
+                target = sqlite3.connect(replica.settings_dict['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    source.close()
+                    target.close()
+                self.stdout.write(f'{replica.alias}: copied in {(time.perf_counter() - started) * 1000:.0f} ms')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
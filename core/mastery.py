@@ -0,0 +1,190 @@
+"""Per-student topic mastery and per-question difficulty (Rasch/Elo style).
+
+A graded submission is one observation: its score out of SCORE_SCALE against
+the mean difficulty of the assignment's questions, with the expected score
+sigmoid(ability - difficulty). On a first grade the student's ability and the
+questions' difficulties move by the prediction error, Elo-style, which costs
+one locked TopicMastery row and one UPDATE however long the history is.
+`manage.py recalibrate_mastery` refits both from the whole score matrix with
+NumPy (nightly), which also absorbs regrades and the order effects of the
+online updates.
+"""
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from .models import LEVEL_DIFFICULTY, Assignment, Question, Submission, TopicMastery
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only needed for recalibrate()
+    np = None
+
+SCORE_SCALE = 10
+K_STUDENT = 3.0    # First grade vs. an average assignment lands on the old <4 / 4-6 / 7+ levels
+K_QUESTION = 0.2
+PRIOR_WEIGHT = 1.0  # Recalibration: pull toward ability 0 / the level's difficulty, in observations
+
+
+def expected(ability, difficulty):
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+def level_for_ability(ability):
+    """Bank level whose starting difficulty is closest to `ability`."""
+    return min(LEVEL_DIFFICULTY, key=lambda level: abs(LEVEL_DIFFICULTY[level] - ability))
+
+
+def key_for(submission):
+    """(student_id, subject_id, topic_lower); `submission` must have assignment loaded."""
+    return submission.student_id, submission.assignment.subject_id, submission.assignment.topic.lower()
+
+
+def abilities(keys):
+    """{(student_id, subject_id, topic_lower): ability} for the keys that have a mastery row, in one query."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    rows = TopicMastery.objects.filter(
+        student_id__in={k[0] for k in keys}, topic__in={k[2] for k in keys},
+    ).values_list('student_id', 'subject_id', 'topic', 'ability')
+    return {row[:3]: row[3] for row in rows if row[:3] in keys}
+
+
+def record_grade(submission, previous_score):
+    record_grades([(submission, previous_score)])
+
+
+def record_grades(changes):
+    """Online update for [(submission, previous_score)].
+
+    Only first grades count as new observations; regrades are left to the
+    nightly recalibration so a score typo doesn't move the rating twice.
+    """
+    fresh = [s for s, previous_score in changes if previous_score is None and s.score is not None]
+    if not fresh:
+        return
+
+    questions = defaultdict(list)  # assignment_id -> [(question_id, difficulty)]
+    for assignment_id, question_id, difficulty in Assignment.questions.through.objects.filter(
+        assignment_id__in={s.assignment_id for s in fresh},
+    ).values_list('assignment_id', 'question_id', 'question__difficulty'):
+        questions[assignment_id].append((question_id, difficulty))
+
+    keys = {key_for(s) for s in fresh}
+    now = timezone.now()
+    with transaction.atomic():
+        TopicMastery.objects.bulk_create(
+            [TopicMastery(student_id=k[0], subject_id=k[1], topic=k[2]) for k in keys], ignore_conflicts=True,
+        )
+        rows = {
+            (m.student_id, m.subject_id, m.topic): m
+            for m in TopicMastery.objects.select_for_update().filter(
+                student_id__in={k[0] for k in keys}, topic__in={k[2] for k in keys},
+            )
+        }
+        question_deltas = defaultdict(float)
+        for submission in fresh:
+            mastery = rows[key_for(submission)]
+            items = questions.get(submission.assignment_id, [])
+            difficulty = sum(d for _, d in items) / len(items) if items else 0.0
+            error = submission.score / SCORE_SCALE - expected(mastery.ability, difficulty)
+            mastery.ability += K_STUDENT / math.sqrt(1 + mastery.graded_count) * error
+            mastery.graded_count += 1
+            mastery.updated_at = now
+            for question_id, _ in items:
+                question_deltas[question_id] -= K_QUESTION * error  # Beaten questions get easier
+
+        changed = [rows[k] for k in keys]
+        TopicMastery.objects.bulk_update(changed, ['ability', 'graded_count', 'updated_at'])
+        if question_deltas:
+            # Relative update in one statement, so concurrent graders don't overwrite each other
+            Question.objects.filter(id__in=question_deltas).update(difficulty=F('difficulty') + Case(
+                *[When(id=qid, then=Value(delta)) for qid, delta in question_deltas.items()],
+                output_field=FloatField(),
+            ))
+
+
+def recalibrate(iterations=30):
+    """Refit every ability and observed question difficulty from all graded submissions.
+
+    Damped diagonal Newton steps on the binomial (score out of SCORE_SCALE)
+    log-likelihood, alternating abilities and difficulties, with a Gaussian
+    prior toward 0 / the level's starting difficulty. Returns
+    (masteries written, questions written, observations used).
+    """
+    if np is None:
+        raise RuntimeError('Mastery recalibration requires NumPy')
+
+    observations = list(
+        Submission.objects.filter(score__isnull=False)
+        .values_list('student_id', 'assignment__subject_id', 'assignment__topic', 'assignment_id', 'score')
+        .iterator(chunk_size=5000)
+    )
+    if not observations:
+        return 0, 0, 0
+
+    people = {}
+    person_idx = np.empty(len(observations), dtype=np.intp)
+    assignment_ids = np.empty(len(observations), dtype=np.int64)
+    y = np.empty(len(observations))
+    for i, (student_id, subject_id, topic, assignment_id, score) in enumerate(observations):
+        person_idx[i] = people.setdefault((student_id, subject_id, topic.lower()), len(people))
+        assignment_ids[i] = assignment_id
+        y[i] = min(max(score, 0), SCORE_SCALE) / SCORE_SCALE
+    graded_counts = np.bincount(person_idx, minlength=len(people))
+
+    links = np.array(list(
+        Assignment.questions.through.objects.filter(assignment_id__in=set(assignment_ids.tolist()))
+        .values_list('assignment_id', 'question_id')
+    ), dtype=np.int64).reshape(-1, 2)
+    question_ids = np.unique(links[:, 1])
+    levels = dict(Question.objects.filter(id__in=question_ids.tolist()).values_list('id', 'level'))
+    prior = np.array([Question.initial_difficulty(levels.get(qid)) for qid in question_ids.tolist()])
+
+    # Observation x question incidence: expand each observation by its assignment's questions
+    order = np.argsort(links[:, 0], kind='stable')
+    link_assignments, link_questions = links[order, 0], np.searchsorted(question_ids, links[order, 1])
+    starts = np.searchsorted(link_assignments, assignment_ids, side='left')
+    ends = np.searchsorted(link_assignments, assignment_ids, side='right')
+    per_obs = ends - starts
+    inc_obs = np.repeat(np.arange(len(observations)), per_obs)
+    offset = np.arange(per_obs.sum()) - np.repeat(np.cumsum(per_obs) - per_obs, per_obs)
+    inc_q = link_questions[np.repeat(starts, per_obs) + offset]
+    share = (1.0 / np.maximum(per_obs, 1))[inc_obs]  # d(mean difficulty) / d(question difficulty)
+
+    ability = np.zeros(len(people))
+    difficulty = prior.copy()
+    for _ in range(iterations):
+        for side in ('ability', 'difficulty'):
+            mean_b = np.bincount(inc_obs, weights=difficulty[inc_q] * share, minlength=len(observations))
+            p = 1.0 / (1.0 + np.exp(mean_b - ability[person_idx]))
+            residual, info = SCORE_SCALE * (y - p), SCORE_SCALE * p * (1 - p)
+            if side == 'ability':
+                grad = np.bincount(person_idx, weights=residual, minlength=len(people)) - PRIOR_WEIGHT * ability
+                hess = np.bincount(person_idx, weights=info, minlength=len(people)) + PRIOR_WEIGHT
+                ability += np.clip(grad / hess, -1.0, 1.0)
+            elif len(question_ids):
+                grad = -np.bincount(inc_q, weights=residual[inc_obs] * share, minlength=len(question_ids))
+                grad -= PRIOR_WEIGHT * (difficulty - prior)
+                hess = np.bincount(inc_q, weights=info[inc_obs] * share ** 2, minlength=len(question_ids)) + PRIOR_WEIGHT
+                difficulty += np.clip(grad / hess, -1.0, 1.0)
+
+    now = timezone.now()
+    masteries = [
+        TopicMastery(student_id=k[0], subject_id=k[1], topic=k[2], ability=float(a), graded_count=int(n), updated_at=now)
+        for k, a, n in zip(people, ability.tolist(), graded_counts.tolist())
+    ]
+    with transaction.atomic():
+        TopicMastery.objects.bulk_create(
+            masteries, batch_size=1000, update_conflicts=True,
+            unique_fields=['student', 'subject', 'topic'], update_fields=['ability', 'graded_count', 'updated_at'],
+        )
+        Question.objects.bulk_update(
+            [Question(id=qid, difficulty=b) for qid, b in zip(question_ids.tolist(), difficulty.tolist())],
+            ['difficulty'], batch_size=1000,
+        )
+    return len(masteries), len(question_ids), len(observations)
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Keep one question per (subject, topic, question) so the constraint can be added.
+
+    The oldest row stays; assignments that used a duplicate are pointed at it
+    and the duplicates are deleted. Questions without a subject never clash
+    (NULLs are distinct) and are left alone.
+    """
+    Question = apps.get_model("core", "Question")
+    Through = apps.get_model("core", "Assignment").questions.through
+    duplicated = (
+        Question.objects.filter(subject__isnull=False)
+        .values("subject_id", "topic", "question")
+        .annotate(n=Count("id"), keep_id=Min("id"))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    removed = []
+    for group in duplicated:
+        keep_id = group["keep_id"]
+        duplicate_ids = list(
+            Question.objects.filter(subject_id=group["subject_id"], topic=group["topic"], question=group["question"])
+            .exclude(id=keep_id)
+            .values_list("id", flat=True)
+        )
+        links = Through.objects.filter(question_id__in=duplicate_ids)
+        already = set(Through.objects.filter(question_id=keep_id).values_list("assignment_id", flat=True))
+        Through.objects.bulk_create([
+            Through(assignment_id=assignment_id, question_id=keep_id)
+            for assignment_id in set(links.values_list("assignment_id", flat=True)) - already
+        ])
+        links.delete()
+        removed.extend(duplicate_ids)
+    if not removed:
+        return
+    Question.objects.filter(id__in=removed).delete()
+    if schema_editor.connection.vendor == "postgresql":
+        # The deletes leave deferred FK checks pending, and Postgres won't ALTER the table until they have run
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_assignment_students"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="question",
+            constraint=models.UniqueConstraint(
+                fields=("subject", "topic", "question"),
+                name="uniq_question_per_subject_topic",
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_content_hash(apps, schema_editor):
+    Question = apps.get_model("core", "Question")
+    rows = list(Question.objects.values_list("id", "level", "hint"))
+    for start in range(0, len(rows), 2000):
+        Question.objects.bulk_update(
+            [
+                Question(
+                    id=pk,
+                    content_hash=hashlib.sha1(
+                        f"{level}\x1f{hint}".encode("utf-8")
+                    ).hexdigest(),
+                )
+                for pk, level, hint in rows[start : start + 2000]
+            ],
+            ["content_hash"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_question_unique_constraint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="is_retired",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
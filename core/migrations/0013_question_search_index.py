@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:45
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_question_fts USING fts5(
+        question, hint, topic,
+        content='core_question', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_question_fts_ai AFTER INSERT ON core_question BEGIN
+        INSERT INTO core_question_fts(rowid, question, hint, topic)
+        VALUES (new.id, new.question, new.hint, new.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_question_fts_ad AFTER DELETE ON core_question BEGIN
+        INSERT INTO core_question_fts(core_question_fts, rowid, question, hint, topic)
+        VALUES ('delete', old.id, old.question, old.hint, old.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_question_fts_au AFTER UPDATE OF question, hint, topic ON core_question BEGIN
+        INSERT INTO core_question_fts(core_question_fts, rowid, question, hint, topic)
+        VALUES ('delete', old.id, old.question, old.hint, old.topic);
+        INSERT INTO core_question_fts(rowid, question, hint, topic)
+        VALUES (new.id, new.question, new.hint, new.topic);
+    END
+    """,
+    "INSERT INTO core_question_fts(core_question_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_question_fts_au",
+    "DROP TRIGGER IF EXISTS core_question_fts_ad",
+    "DROP TRIGGER IF EXISTS core_question_fts_ai",
+    "DROP TABLE IF EXISTS core_question_fts",
+]
+
+# Must match core.search.PG_DOCUMENT (with the "q." alias removed) for the planner to use it
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS core_question_search_gin ON core_question USING GIN (
+        to_tsvector('english', coalesce(question, '') || ' ' || coalesce(hint, '') || ' ' || coalesce(topic, ''))
+    )
+    """,
+]
+
+POSTGRES_REVERSE = ["DROP INDEX IF EXISTS core_question_search_gin"]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_question_sync_manifest"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_question_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["-submitted_at", "-id"], name="submission_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["assignment", "-submitted_at", "-id"],
+                name="submission_assign_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["student", "-submitted_at", "-id"],
+                name="submission_student_recent_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_submission_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentStats",
+            fields=[
+                (
+                    "assignment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="core.assignment",
+                    ),
+                ),
+                ("submitted_count", models.PositiveIntegerField(default=0)),
+                ("graded_count", models.PositiveIntegerField(default=0)),
+                ("score_total", models.IntegerField(default=0)),
+                ("score_counts", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
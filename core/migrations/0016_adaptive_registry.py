@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:16
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+LEVEL_RE = re.compile(r"level:\s*(low|medium|high)", re.IGNORECASE)
+
+
+def backfill_registry(apps, schema_editor):
+    """Register existing adaptive follow-ups; the first per (student, subject, topic, level) wins."""
+    Assignment = apps.get_model("core", "Assignment")
+    AdaptiveAssignment = apps.get_model("core", "AdaptiveAssignment")
+    rows = []
+    for assignment_id, subject_id, topic, description, student_id in (
+        Assignment.objects.filter(is_adaptive=True, students__isnull=False)
+        .order_by("id")
+        .values_list("id", "subject_id", "topic", "description", "students")
+    ):
+        match = LEVEL_RE.search(description)
+        if match:
+            rows.append(
+                AdaptiveAssignment(
+                    assignment_id=assignment_id,
+                    student_id=student_id,
+                    subject_id=subject_id,
+                    topic=topic.lower(),
+                    level=match.group(1).lower(),
+                )
+            )
+    AdaptiveAssignment.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_assignment_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdaptiveAssignment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("topic", models.CharField(max_length=100)),
+                (
+                    "level",
+                    models.CharField(
+                        choices=[
+                            ("low", "Low"),
+                            ("medium", "Medium"),
+                            ("high", "High"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "assignment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="adaptive_entry",
+                        to="core.assignment",
+                    ),
+                ),
+                (
+                    "source_submission",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="adaptive_followups",
+                        to="core.submission",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="adaptive_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.subject"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("student", "subject", "topic", "level"),
+                        name="uniq_adaptive_per_student_topic_level",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_registry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of core.models.LEVEL_DIFFICULTY at the time of this migration
+LEVEL_DIFFICULTY = {"low": -1.0, "medium": 0.0, "high": 1.0}
+
+
+def seed_difficulty(apps, schema_editor):
+    """Start every question at its level's difficulty; grading refines it from there."""
+    Question = apps.get_model("core", "Question")
+    for level, difficulty in LEVEL_DIFFICULTY.items():
+        Question.objects.filter(level__iexact=level).update(difficulty=difficulty)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_job_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="difficulty",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.CreateModel(
+            name="TopicMastery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("topic", models.CharField(max_length=100)),
+                ("ability", models.FloatField(default=0.0)),
+                ("graded_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="masteries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "subject",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.subject"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("student", "subject", "topic"),
+                        name="uniq_mastery_per_student_topic",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(seed_difficulty, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_topic_mastery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="test_cases",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
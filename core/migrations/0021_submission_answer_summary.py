@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:05
+
+import json
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def summarize_answers(raw):
+    """Frozen copy of core.models.summarize_answers at the time of this migration."""
+    if not raw:
+        return False, 0
+    try:
+        parsed = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return False, 0
+    if isinstance(parsed, dict):
+        count = sum(1 for value in parsed.values() if value and str(value).strip())
+    elif isinstance(parsed, list):
+        count = sum(1 for item in parsed if str(item).strip())
+    else:
+        count = 1 if parsed else 0
+    return count > 0, count
+
+
+def backfill(apps, schema_editor):
+    """Summarize existing answers in id-ordered batches, so memory and transaction size stay bounded."""
+    Submission = apps.get_model("core", "Submission")
+    last_id = 0
+    while True:
+        batch = list(
+            Submission.objects.filter(id__gt=last_id).order_by("id").only("id", "answers")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        changed = []
+        for submission in batch:
+            has_content, answered_count = summarize_answers(submission.answers)
+            if has_content:  # The new columns default to (False, 0)
+                submission.has_content, submission.answered_count = has_content, answered_count
+                changed.append(submission)
+        Submission.objects.bulk_update(changed, ["has_content", "answered_count"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_answer_fingerprints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="answered_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="has_content",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
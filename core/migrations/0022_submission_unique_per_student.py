@@ -0,0 +1,150 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:40
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def recompute_stats(apps, assignment_ids):
+    """Same numbers as core.stats.rebuild, for the assignments whose submissions moved."""
+    Submission = apps.get_model("core", "Submission")
+    AssignmentStats = apps.get_model("core", "AssignmentStats")
+    for assignment_id in assignment_ids:
+        scores = list(Submission.objects.filter(assignment_id=assignment_id).values_list("score", flat=True))
+        graded = [score for score in scores if score is not None]
+        AssignmentStats.objects.update_or_create(
+            assignment_id=assignment_id,
+            defaults={
+                "submitted_count": len(scores),
+                "graded_count": len(graded),
+                "score_total": sum(graded),
+                "score_counts": {str(score): n for score, n in Counter(graded).items()},
+            },
+        )
+
+
+def check_deferred_constraints(schema_editor):
+    """Run the deferred foreign key checks of the rows just written or deleted.
+
+    Postgres refuses to ALTER or DROP a table with trigger events still
+    pending in the transaction ("pending trigger events"), and the next
+    operation does one or the other.
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def archive_duplicates(apps, schema_editor):
+    """Keep one submission per (assignment, student) so the constraint can be added.
+
+    The graded one stays, else the oldest (the one the submit page already
+    showed). The others are moved, with their answers, scores and feedback,
+    to ArchivedSubmission, linked to the one that stayed; unapplying the
+    migration puts them back.
+    """
+    Submission = apps.get_model("core", "Submission")
+    ArchivedSubmission = apps.get_model("core", "ArchivedSubmission")
+    duplicated = (
+        Submission.objects.values("assignment_id", "student_id")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    archived, assignment_ids = [], set()
+    for group in duplicated:
+        rows = list(
+            Submission.objects.filter(assignment_id=group["assignment_id"], student_id=group["student_id"])
+            .order_by("id")
+        )
+        keep = next((row for row in rows if row.score is not None), rows[0])
+        archived.extend(
+            ArchivedSubmission(
+                original_id=row.id, kept_id=keep.id, assignment_id=row.assignment_id, student_id=row.student_id,
+                answers=row.answers, has_content=row.has_content, answered_count=row.answered_count,
+                submitted_at=row.submitted_at, score=row.score, feedback=row.feedback,
+            )
+            for row in rows if row.id != keep.id
+        )
+        assignment_ids.add(group["assignment_id"])
+    if not archived:
+        return
+    ArchivedSubmission.objects.bulk_create(archived)
+    Submission.objects.filter(id__in=[row.original_id for row in archived]).delete()
+    recompute_stats(apps, assignment_ids)
+    check_deferred_constraints(schema_editor)
+
+
+def restore_duplicates(apps, schema_editor):
+    Submission = apps.get_model("core", "Submission")
+    ArchivedSubmission = apps.get_model("core", "ArchivedSubmission")
+    archived = list(ArchivedSubmission.objects.all())
+    if not archived:
+        return
+    Submission.objects.bulk_create([
+        Submission(
+            id=row.original_id, assignment_id=row.assignment_id, student_id=row.student_id, answers=row.answers,
+            has_content=row.has_content, answered_count=row.answered_count, score=row.score, feedback=row.feedback,
+        )
+        for row in archived
+    ])
+    for row in archived:  # submitted_at is auto_now_add, so it can only be restored by an update
+        Submission.objects.filter(id=row.original_id).update(submitted_at=row.submitted_at)
+    ArchivedSubmission.objects.all().delete()
+    recompute_stats(apps, {row.assignment_id for row in archived})
+    check_deferred_constraints(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_submission_answer_summary"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedSubmission",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("original_id", models.PositiveIntegerField(unique=True)),
+                ("answers", models.TextField()),
+                ("has_content", models.BooleanField(default=False)),
+                ("answered_count", models.PositiveIntegerField(default=0)),
+                ("submitted_at", models.DateTimeField()),
+                ("score", models.IntegerField(blank=True, null=True)),
+                ("feedback", models.TextField(blank=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "assignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="core.assignment"
+                    ),
+                ),
+                (
+                    "kept",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_duplicates",
+                        to="core.submission",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(archive_duplicates, restore_duplicates),
+        migrations.AddConstraint(
+            model_name="submission",
+            constraint=models.UniqueConstraint(
+                fields=("assignment", "student"), name="uniq_submission_per_student"
+            ),
+        ),
+    ]
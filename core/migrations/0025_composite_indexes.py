@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0024_submission_versions"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="assignment",
+            index=models.Index(
+                fields=["subject", "due_date"], name="assignment_subject_due_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="assignment",
+            index=models.Index(
+                fields=["created_by", "due_date"], name="assignment_teacher_due_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                condition=models.Q(("is_retired", False)),
+                fields=["subject", "topic", "level"],
+                name="question_live_topic_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                condition=models.Q(("has_content", True), ("score__isnull", True)),
+                fields=["assignment", "-submitted_at", "-id"],
+                name="submission_ungraded_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:11
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0025_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                models.F("subject"),
+                django.db.models.functions.text.Lower("topic"),
+                django.db.models.functions.text.Lower("level"),
+                condition=models.Q(("is_retired", False)),
+                name="question_live_pool_idx",
+            ),
+        ),
+    ]
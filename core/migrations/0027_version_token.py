@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0026_question_pool_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersionToken",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+                ("token", models.CharField(max_length=32)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0027_version_token"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(fields=["updated_at"], name="submission_changed_idx"),
+        ),
+    ]
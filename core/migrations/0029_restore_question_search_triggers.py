@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:05
+
+from importlib import import_module
+
+from django.db import migrations
+
+# SQLite rebuilds core_question for AddField (0018 difficulty, 0019 test_cases), and the rebuild drops the
+# search triggers created in 0013: put them back and re-index what was written without them
+search_index = import_module("core.migrations.0013_question_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0028_submission_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index._run({"sqlite": search_index.SQLITE_FORWARD}),
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0029_restore_question_search_triggers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UsageCounter",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
+import hashlib
 import json
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 import random
 import string
 from django.core.exceptions import ValidationError
@@ -39,6 +42,10 @@ class Enrollment(models.Model):
     class Meta:
         unique_together = ('subject', 'student')
 
+# Starting difficulty per bank level, on the same logit scale as TopicMastery.ability
+LEVEL_DIFFICULTY = {'low': -1.0, 'medium': 0.0, 'high': 1.0}
+
+
 class Question(models.Model):
     LEVEL_CHOICES = [
         ('low', 'Low'),
@@ -50,7 +57,41 @@ class Question(models.Model):
     level = models.CharField(max_length=10, choices=LEVEL_CHOICES,default='medium')
     question = models.CharField(max_length=100)
     hint = models.TextField(blank=True)
-    
+    # Sync manifest: hash of the CSV-owned content (level + hint) for delta loads
+    content_hash = models.CharField(max_length=40, blank=True)
+    is_retired = models.BooleanField(default=False)  # Removed from the CSV; kept for existing assignments
+    # IRT-style difficulty on the mastery scale (core/mastery.py); seeded from the level, refined by grading
+    difficulty = models.FloatField(default=0.0)
+    # Auto-grader cases (core/autograder.py): [{"stdin": "...", "stdout": "..."}]; empty = graded by hand
+    test_cases = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        constraints = [
+            # Natural key of a bank row; lets load_questions upsert in bulk
+            models.UniqueConstraint(fields=['subject', 'topic', 'question'], name='uniq_question_per_subject_topic'),
+        ]
+        indexes = [
+            # Topic pickers and per-level selection only ever look at the live bank
+            models.Index(fields=['subject', 'topic', 'level'], condition=models.Q(is_retired=False),
+                         name='question_live_topic_idx'),
+            # Adaptive follow-up pools (core/adaptive.py): live questions of a subject by case-folded topic
+            models.Index(models.F('subject'), Lower('topic'), Lower('level'), condition=models.Q(is_retired=False),
+                         name='question_live_pool_idx'),
+        ]
+
+    @staticmethod
+    def compute_content_hash(level, hint):
+        return hashlib.sha1(f"{level}\x1f{hint}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def initial_difficulty(level):
+        return LEVEL_DIFFICULTY.get((level or '').lower(), 0.0)
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash(self.level, self.hint)
+        if self._state.adding and not self.difficulty:
+            self.difficulty = self.initial_difficulty(self.level)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.topic} - {self.question[:50]}"
@@ -67,37 +108,278 @@ class Assignment(models.Model):
     is_adaptive = models.BooleanField(default=False)  
     questions = models.ManyToManyField(Question, blank=True)
     students = models.ManyToManyField(User, related_name='assignments', blank=True, help_text="Students assigned to this assignment")
+
+    class Meta:
+        indexes = [
+            # Every assignment list is per subject or per teacher, ordered by due date
+            models.Index(fields=['subject', 'due_date'], name='assignment_subject_due_idx'),
+            models.Index(fields=['created_by', 'due_date'], name='assignment_teacher_due_idx'),
+        ]
+
     def __str__(self):
         return f"{self.subject.name} - {self.topic}"
 
+def parse_answers(raw):
+    """{question id (str): answer} from a Submission.answers string; {} for anything else."""
+    try:
+        answers = json.loads(raw) if raw else {}
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return answers if isinstance(answers, dict) else {}
+
+def summarize_answers(raw):
+    """(has_content, answered_count) for a Submission.answers string; non-empty values count as answered."""
+    if not raw:
+        return False, 0
+    try:
+        parsed = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return False, 0
+    if isinstance(parsed, dict):
+        count = sum(1 for value in parsed.values() if value and str(value).strip())
+    elif isinstance(parsed, list):
+        count = sum(1 for item in parsed if str(item).strip())
+    else:
+        count = 1 if parsed else 0
+    return count > 0, count
+
 class Submission(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)
     student = models.ForeignKey(User, on_delete=models.CASCADE)
     answers = models.TextField()  # JSON-like or plain text for answers
+    # Derived from answers on save, so lists can filter in SQL without decoding the blob
+    has_content = models.BooleanField(default=False)
+    answered_count = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=1)  # Bumped by each resubmission; history in SubmissionVersion
     submitted_at = models.DateTimeField(auto_now_add=True)
     score = models.IntegerField(null=True, blank=True)  # Out of 100
     feedback = models.TextField(blank=True)
+    # Any write (grade, resubmission); core/suggestions.py syncs only the rows changed since its last look
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the teacher submission tables on (submitted_at, id)
+            models.Index(fields=['-submitted_at', '-id'], name='submission_recent_idx'),
+            models.Index(fields=['assignment', '-submitted_at', '-id'], name='submission_assign_recent_idx'),
+            models.Index(fields=['student', '-submitted_at', '-id'], name='submission_student_recent_idx'),
+            # The grading queue (batch_grade, ?status=ungraded): only the rows still waiting for a grade
+            models.Index(fields=['assignment', '-submitted_at', '-id'], condition=models.Q(score__isnull=True, has_content=True),
+                         name='submission_ungraded_idx'),
+            models.Index(fields=['updated_at'], name='submission_changed_idx'),
+        ]
+        constraints = [
+            # One submission per student and assignment; core.ingest relies on it to make submitting idempotent
+            models.UniqueConstraint(fields=['assignment', 'student'], name='uniq_submission_per_student'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.assignment}"
-    
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'answers' in update_fields:
+            self.has_content, self.answered_count = summarize_answers(self.answers)
+            if update_fields is not None:
+                update_fields = {*update_fields, 'has_content', 'answered_count'}
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}  # auto_now only touches saved fields
+        super().save(*args, **kwargs)
+
     def has_real_answers(self):
-        """Returns True if answers has non-empty content."""
-        if not self.answers:
-            return False
-        try:
-            parsed = json.loads(self.answers)
-            if isinstance(parsed, dict):
-                return any(
-                    value and str(value).strip()  # Non-empty strings/keys
-                    for value in parsed.values()
-                )
-            elif isinstance(parsed, list):
-                return any(str(item).strip() for item in parsed)
-            return bool(parsed)
-        except (json.JSONDecodeError, TypeError):
-            return False
+        """Returns True if answers has non-empty content (stored in has_content on save)."""
+        return self.has_content
 
     def is_submitted(self):
         """True if submitted_at is set AND has real answers."""
-        return self.submitted_at and self.has_real_answers()
\ No newline at end of file
+        return self.submitted_at and self.has_real_answers()
+
+class ArchivedSubmission(models.Model):
+    """A duplicate (assignment, student) submission set aside when they became unique (migration 0022)."""
+    original_id = models.PositiveIntegerField(unique=True)
+    # The submission that was kept for the same student and assignment
+    kept = models.ForeignKey(Submission, on_delete=models.SET_NULL, null=True, related_name='archived_duplicates')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='+')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    answers = models.TextField()
+    has_content = models.BooleanField(default=False)
+    answered_count = models.PositiveIntegerField(default=0)
+    submitted_at = models.DateTimeField()
+    score = models.IntegerField(null=True, blank=True)
+    feedback = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.student_id} - {self.assignment_id} (archived #{self.original_id})"
+
+class SubmissionVersion(models.Model):
+    """One version of a resubmitted Submission, stored compactly by core.versions (the latest is also on the Submission)."""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='versions')
+    number = models.PositiveIntegerField()
+    is_snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()  # zlib-compressed JSON: the full answers, or a delta against number - 1
+    submitted_at = models.DateTimeField()
+    score = models.IntegerField(null=True, blank=True)  # Grade this version had when it was replaced
+    feedback = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'number'], name='uniq_submission_version'),
+        ]
+
+class Draft(models.Model):
+    """Autosaved, not yet submitted answers of one student (core/drafts.py); replaced by the Submission on submit."""
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='drafts')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='drafts')
+    answers = models.JSONField(default=dict)  # {question id: text}
+    stamps = models.JSONField(default=dict)  # {question id: write time in ns}; older deltas never overwrite newer ones
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'assignment'], name='uniq_draft_per_student'),
+        ]
+
+class AdaptiveAssignment(models.Model):
+    """Registry of generated follow-ups: at most one per (student, subject, topic, level)."""
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE, related_name='adaptive_entry')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='adaptive_entries')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    topic = models.CharField(max_length=100)  # Lower-cased, matches topics case-insensitively
+    level = models.CharField(max_length=10, choices=Question.LEVEL_CHOICES)
+    source_submission = models.ForeignKey(
+        'Submission', on_delete=models.SET_NULL, null=True, blank=True, related_name='adaptive_followups'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'subject', 'topic', 'level'], name='uniq_adaptive_per_student_topic_level'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.topic} ({self.level})"
+
+
+class TopicMastery(models.Model):
+    """Elo/IRT-style ability of one student on one topic of a subject, maintained by core.mastery."""
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='masteries')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    topic = models.CharField(max_length=100)  # Lower-cased, like AdaptiveAssignment.topic
+    ability = models.FloatField(default=0.0)
+    graded_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'subject', 'topic'], name='uniq_mastery_per_student_topic'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.topic}: {self.ability:+.2f}"
+
+
+class AnswerFingerprint(models.Model):
+    """One winnowed k-gram hash of one answer (core/similarity.py); the (assignment, hash) index is the inverted index."""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='fingerprints')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)  # Denormalized for the per-assignment scan
+    question_id = models.IntegerField()  # Key in Submission.answers
+    hash = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['assignment', 'hash'], name='fingerprint_assign_hash_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id}/{self.question_id}: {self.hash}"
+
+
+class AssignmentStats(models.Model):
+    """Materialized grade summary for one assignment, maintained incrementally by core.stats."""
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    submitted_count = models.PositiveIntegerField(default=0)
+    graded_count = models.PositiveIntegerField(default=0)
+    score_total = models.IntegerField(default=0)
+    score_counts = models.JSONField(default=dict)  # {"<score>": number of graded submissions}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def pending_count(self):
+        return self.submitted_count - self.graded_count
+
+    @property
+    def average_score(self):
+        return self.score_total / self.graded_count if self.graded_count else None
+
+    @property
+    def median_score(self):
+        return median_from_counts(self.score_counts)
+
+    def __str__(self):
+        return f"Stats for {self.assignment_id}"
+
+
+def median_from_counts(score_counts):
+    """Median of a {score: count} histogram, without expanding it."""
+    items = sorted((int(score), count) for score, count in score_counts.items() if count)
+    n = sum(count for _, count in items)
+    if not n:
+        return None
+    wanted = [(n - 1) // 2, n // 2]  # 0-based ranks of the middle element(s)
+    values = []
+    seen = 0
+    for score, count in items:
+        while wanted and wanted[0] < seen + count:
+            values.append(score)
+            wanted.pop(0)
+        seen += count
+    return sum(values) / 2
+
+
+class Job(models.Model):
+    """Background job row for core.jobs; claimed by `manage.py run_worker`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Not claimed before this (retry backoff)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class VersionToken(models.Model):
+    """Invalidation token every web and worker process sees, whatever their CACHES backend (core/adaptive.py)."""
+    name = models.CharField(max_length=100, primary_key=True)
+    token = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.token}"
+
+
+class UsageCounter(models.Model):
+    """Cumulative count summed over every process (core/counters.py), e.g. dashboard cache hits."""
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,59 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+SUBMISSIONS_PER_PAGE = 50
+
+
+def encode_cursor(submitted_at, pk):
+    raw = f"{submitted_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (submitted_at, id) or None for a missing/garbled cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(stamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def filter_submissions(submissions, params):
+    """Apply the teacher table filters: ?status=graded|ungraded&assignment=<id>&student=<username>."""
+    status = params.get('status', '')
+    if status == 'graded':
+        submissions = submissions.filter(score__isnull=False)
+    elif status == 'ungraded':
+        submissions = submissions.filter(score__isnull=True)
+    assignment_id = params.get('assignment', '')
+    if assignment_id.isdigit():
+        submissions = submissions.filter(assignment_id=int(assignment_id))
+    student = params.get('student', '').strip()
+    if student:
+        submissions = submissions.filter(student__username=student)
+    return submissions
+
+
+def keyset_page(submissions, cursor=None, per_page=SUBMISSIONS_PER_PAGE):
+    """Newest-first page of submissions after `cursor`, seeking on (submitted_at, id).
+
+    Every page is an index range scan of per_page + 1 rows, however deep the
+    teacher pages. Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    position = decode_cursor(cursor)
+    if position:
+        submitted_at, pk = position
+        submissions = submissions.filter(
+            Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=pk)
+        )
+    rows = list(submissions.order_by('-submitted_at', '-id')[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,137 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+from . import counters
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_CSV = 'questions.csv'  # Place next to manage.py
+HITS, MISSES, RELOADS = 'question_bank:hits', 'question_bank:misses', 'question_bank:reloads'  # UsageCounter names
+
+
+class QuestionBank:
+    """In-process index of questions.csv: subject -> topic -> [questions].
+
+    The file is parsed once per worker and re-parsed only when its mtime/size
+    change AND its content hash differs, so a plain `touch` does not rebuild.
+    A file that can't be read or parsed is logged and the last good snapshot
+    keeps being served until the file changes again.
+
+    Lookups are counted as hits (served from the index) or misses (the file
+    had changed and was re-read first), per process in stats() and summed
+    over every process in totals() (`manage.py question_bank_stats`).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None      # (mtime_ns, size) of the last parsed file
+        self._digest = None     # sha1 of the last parsed file
+        self._by_subject = {}   # subject -> (questions_by_topic, topics)
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        """Re-parse the CSV if it changed. Returns True if the index was rebuilt."""
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp is not None and stamp == self._stamp:  # Another thread reloaded meanwhile
+                return False
+            if stamp is None:
+                self._by_subject, self._digest = {}, None
+                self._stamp = None
+                return True
+            rebuilt = False
+            try:
+                with open(self.path, 'rb') as file:
+                    raw = file.read()
+                digest = hashlib.sha1(raw).hexdigest()
+                if digest != self._digest:
+                    self._build(raw.decode('utf-8'))
+                    self._digest = digest
+                    self.reloads += 1
+                    counters.incr(RELOADS)
+                    rebuilt = True
+                    logger.info('Loaded %s: %d subjects (%d hits, %d misses since start)',
+                                self.path, len(self._by_subject), self.hits, self.misses)
+            except (OSError, UnicodeDecodeError, csv.Error) as exc:
+                # Not retried until the file changes; until then the previous questions stay in use
+                logger.error('Could not load %s, keeping the last good question bank: %s', self.path, exc)
+            self._stamp = stamp
+            return rebuilt
+
+    def _build(self, text):
+        by_subject = {}
+        for row in csv.DictReader(io.StringIO(text, newline='')):
+            subj = (row.get('subject') or '').strip()
+            topic = (row.get('topic') or '').strip()
+            if not topic:
+                continue
+            q = {
+                'level': (row.get('level') or 'low').strip().lower(),
+                'question': (row.get('question') or '').strip(),
+                'hint': (row.get('hint') or '').strip(),
+            }
+            questions_by_topic, _ = by_subject.setdefault(subj, ({}, []))
+            questions_by_topic.setdefault(topic, []).append(q)
+        for subj, (questions_by_topic, topics) in by_subject.items():
+            topics.extend(sorted(questions_by_topic))
+        self._by_subject = by_subject
+
+    def for_subject(self, subject_name):
+        """Return (questions_by_topic, topics) for a subject, same shape as the old CSV scan."""
+        if self._refresh():
+            self.misses += 1
+            counters.incr(MISSES)
+        else:
+            self.hits += 1
+            counters.incr(HITS)
+        return self._by_subject.get(subject_name, ({}, []))
+
+    def stats(self):
+        """This process's counts."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'digest': self._digest,
+            'subjects': len(self._by_subject),
+        }
+
+
+_bank = None
+
+
+def get_question_bank():
+    """Shared per-worker QuestionBank for settings.BASE_DIR/questions.csv."""
+    global _bank
+    path = os.path.join(settings.BASE_DIR, QUESTIONS_CSV)
+    if _bank is None or _bank.path != path:
+        _bank = QuestionBank(path)
+    return _bank
+
+
+def totals():
+    """Hits, misses and reloads summed over every process."""
+    counts = counters.read(HITS, MISSES, RELOADS)
+    hits, misses = counts[HITS], counts[MISSES]
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'reloads': counts[RELOADS], 'hit_ratio': hits / total if total else 0.0}
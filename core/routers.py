@@ -0,0 +1,97 @@
+"""Read-replica routing (settings.DATABASE_REPLICAS).
+
+ReplicaRoutingMiddleware decides per request whether reads may go to a
+replica: only GET/HEAD requests to views that opted in (@replica_reads, or
+every view not marked @primary_reads when REPLICA_READS_BY_DEFAULT is on),
+and only if the browser hasn't written anything in the last
+REPLICA_STICKY_SECONDS. ReplicaRouter sends everything else, every write,
+and every read after the request's first write or inside a transaction,
+to the primary.
+
+A request that writes sets a short-lived cookie. That browser then reads
+from the primary until the replicas have caught up, so a student who just
+submitted sees the submission on the next page.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_request = contextvars.ContextVar('db_routing', default=None)
+
+
+class _RoutingState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None  # Alias serving this request's reads; None = primary
+        self.wrote = False
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def replica_reads(view):
+    """Opt a read-only view in: its GET/HEAD reads may be served by a replica."""
+    view.db_reads = 'replica'
+    return view
+
+
+def primary_reads(view):
+    """Opt a view out: always read from the primary, even with REPLICA_READS_BY_DEFAULT."""
+    view.db_reads = 'primary'
+    return view
+
+
+def reading_from_replica():
+    """True while the current request's reads go to a replica (nothing written yet, outside transactions)."""
+    state = _request.get()
+    return bool(state and state.replica and not state.wrote and not connections[DEFAULT_DB_ALIAS].in_atomic_block)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _request.get().replica if reading_from_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS  # Also for instances that were loaded from a replica
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows, so objects read from any of them may be related
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.replicas = replica_aliases()
+
+    def __call__(self, request):
+        state = _RoutingState()
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state.wrote:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reads = getattr(view_func, 'db_reads', 'replica' if settings.REPLICA_READS_BY_DEFAULT else 'primary')
+        if (reads == 'replica' and self.replicas and request.method in SAFE_METHODS
+                and STICKY_COOKIE not in request.COOKIES):
+            _request.get().replica = random.choice(self.replicas)
+        return None
@@ -0,0 +1,92 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Question
+
+# Kept in sync by the triggers / expression index created in migration 0013. On SQLite, a migration that
+# rebuilds core_question (AddField, AlterField) drops the triggers and must re-create them, as 0029 does
+FTS_TABLE = 'core_question_fts'
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce(q.question, '') || ' ' || coalesce(q.hint, '') || ' ' || coalesce(q.topic, ''))"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall((query or '').lower())
+
+
+def search_questions(subject, query, page=1, per_page=20):
+    """Ranked prefix search over question/hint/topic for one subject.
+
+    Returns (rows, has_next) where rows are dicts with id, topic, level, question,
+    hint and rank. Every term must match; the last characters of a term may be
+    missing (prefix match), so "lo" finds "loop" and "loops".
+    """
+    terms = tokenize(query)
+    if not terms:
+        return [], False
+    page = max(1, page)
+    offset = (page - 1) * per_page
+
+    if connection.vendor == 'sqlite':
+        rows = _search_sqlite(subject.id, terms, per_page + 1, offset)
+    elif connection.vendor == 'postgresql':
+        rows = _search_postgres(subject.id, terms, per_page + 1, offset)
+    else:
+        rows = _search_fallback(subject.id, terms, per_page + 1, offset)
+    return rows[:per_page], len(rows) > per_page
+
+
+def _rows(cursor):
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _search_sqlite(subject_id, terms, limit, offset):
+    # FTS5 prefix query: "term"* AND-ed together; quoting keeps FTS syntax out of user input
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT q.id, q.topic, q.level, q.question, q.hint,
+                   bm25({FTS_TABLE}, 3.0, 1.0, 2.0) AS rank
+            FROM {FTS_TABLE}
+            JOIN core_question q ON q.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND q.subject_id = %s AND NOT q.is_retired
+            ORDER BY rank
+            LIMIT %s OFFSET %s
+            """,
+            [match, subject_id, limit, offset],
+        )
+        return _rows(cursor)
+
+
+def _search_postgres(subject_id, terms, limit, offset):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT q.id, q.topic, q.level, q.question, q.hint,
+                   ts_rank({PG_DOCUMENT}, to_tsquery('english', %s)) AS rank
+            FROM core_question q
+            WHERE {PG_DOCUMENT} @@ to_tsquery('english', %s)
+              AND q.subject_id = %s AND NOT q.is_retired
+            ORDER BY rank DESC, q.id
+            LIMIT %s OFFSET %s
+            """,
+            [tsquery, tsquery, subject_id, limit, offset],
+        )
+        return _rows(cursor)
+
+
+def _search_fallback(subject_id, terms, limit, offset):
+    # Other backends: unindexed icontains scan, same result shape
+    qs = Question.objects.filter(subject_id=subject_id, is_retired=False)
+    for term in terms:
+        qs = qs.filter(Q(question__icontains=term) | Q(hint__icontains=term) | Q(topic__icontains=term))
+    rows = qs.order_by('id').values('id', 'topic', 'level', 'question', 'hint')[offset:offset + limit]
+    return [dict(row, rank=0) for row in rows]
@@ -0,0 +1,55 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import adaptive, dashboard_cache
+from .models import Assignment, Enrollment, Question, Subject, Submission
+
+
+@receiver([post_save, post_delete], sender=Submission)
+def submission_changed(sender, instance, **kwargs):
+    dashboard_cache.bump('user', instance.student_id)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    dashboard_cache.bump('user', instance.student_id)
+
+
+@receiver([post_save, post_delete], sender=Assignment)
+def assignment_changed(sender, instance, **kwargs):
+    dashboard_cache.bump('subject', instance.subject_id)
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def subject_changed(sender, instance, **kwargs):
+    dashboard_cache.bump('subject', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    # Assignment previews show the first question's text/hint
+    dashboard_cache.bump('subject', instance.subject_id)
+    adaptive.invalidate_question_pools()
+
+
+@receiver(m2m_changed, sender=Assignment.students.through)
+def assignment_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:  # user.assignments.add(...)
+        dashboard_cache.bump('user', instance.pk)
+        dashboard_cache.bump('subject', *Assignment.objects.filter(pk__in=pk_set or ()).values_list('subject_id', flat=True))
+    elif pk_set:
+        dashboard_cache.bump('user', *pk_set)
+    else:  # post_clear: the removed students are no longer known
+        dashboard_cache.bump('subject', instance.subject_id)
+
+
+@receiver(m2m_changed, sender=Assignment.questions.through)
+def assignment_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:  # question.assignment_set.add(...)
+        dashboard_cache.bump('subject', *Assignment.objects.filter(pk__in=pk_set or ()).values_list('subject_id', flat=True))
+    else:
+        dashboard_cache.bump('subject', instance.subject_id)
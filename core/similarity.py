@@ -0,0 +1,179 @@
+"""Code-similarity index over submission answers (winnowing, as in MOSS).
+
+Each answer is tokenized and normalized (identifiers -> V, numbers -> N,
+strings -> S, comments and layout dropped), hashed as overlapping K-grams of
+tokens, and winnowed: the minimum hash of every window of W consecutive
+K-grams is kept. Any shared run of at least K + W - 1 tokens is guaranteed
+to produce a shared fingerprint, whatever the renaming or reformatting.
+
+Fingerprints are stored per (submission, question) at submission time in
+AnswerFingerprint, indexed on (assignment, hash). A report walks that
+inverted index once: every posting list yields its candidate pairs, so the
+cost is proportional to the postings, not to n² text comparisons.
+Fingerprints that occur in many answers (the obvious way to solve the
+exercise, starter code) are skipped as they prove nothing.
+"""
+import builtins
+import hashlib
+import io
+import keyword
+import re
+import tokenize
+from collections import Counter, defaultdict
+
+from .models import AnswerFingerprint, Submission, parse_answers
+
+K = 10  # Tokens per k-gram; normalized Python is repetitive, so shorter grams are shared by chance
+W = 5   # Winnowing window, in k-grams
+# A fingerprint found in more answers than this proves nothing (like MOSS's -m). Capping the posting
+# lists also bounds the pairs each one can produce, which keeps a report linear in the postings.
+MAX_DOC_FREQ = 20
+MAX_DOC_SHARE = 0.2  # Stricter for small classes: at most this share of the answers to a question
+
+_SKIP = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+         tokenize.ENCODING, tokenize.ENDMARKER}
+_FALLBACK_RE = re.compile(r"'[^'\n]*'|\"[^\"\n]*\"|#[^\n]*|[A-Za-z_]\w*|\d+(?:\.\d+)?|\S")
+_BUILTINS = set(dir(builtins))
+
+
+def _normalize(kind, text):
+    if kind == tokenize.NAME:
+        if keyword.iskeyword(text) or text in _BUILTINS:
+            return text
+        return 'V'
+    if kind == tokenize.NUMBER:
+        return 'N'
+    if kind == tokenize.STRING or kind == getattr(tokenize, 'FSTRING_START', None):
+        return 'S'
+    return text
+
+
+def tokens(code):
+    """Normalized token stream; falls back to a regex lexer for code that doesn't tokenize."""
+    try:
+        return [
+            _normalize(tok.type, tok.string)
+            for tok in tokenize.generate_tokens(io.StringIO(code).readline)
+            if tok.type not in _SKIP
+        ]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        out = []
+        for text in _FALLBACK_RE.findall(code):
+            if text[0] == '#':
+                continue
+            if text[0] in '\'"':
+                out.append('S')
+            elif text[0].isdigit():
+                out.append('N')
+            elif text[0].isalpha() or text[0] == '_':
+                out.append(_normalize(tokenize.NAME, text))
+            else:
+                out.append(text)
+        return out
+
+
+def _hash(gram):
+    return int.from_bytes(hashlib.blake2b('\x1f'.join(gram).encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def fingerprints(code, k=K, w=W):
+    """Set of winnowed k-gram hashes for one answer."""
+    toks = tokens(code)
+    if len(toks) < k:
+        return {_hash(toks)} if toks else set()
+    hashes = [_hash(toks[i:i + k]) for i in range(len(toks) - k + 1)]
+    if len(hashes) <= w:
+        return {min(hashes)}
+    selected = set()
+    for start in range(len(hashes) - w + 1):
+        window = hashes[start:start + w]
+        selected.add(min(window))
+    return selected
+
+
+def fingerprint_rows(submission):
+    """AnswerFingerprint rows (unsaved) for every non-empty answer of `submission`."""
+    rows = []
+    for key, code in parse_answers(submission.answers).items():
+        if not str(key).isdigit() or not str(code or '').strip():
+            continue
+        rows.extend(
+            AnswerFingerprint(
+                submission_id=submission.id, assignment_id=submission.assignment_id, question_id=int(key), hash=h,
+            )
+            for h in fingerprints(str(code))
+        )
+    return rows
+
+
+def index_submissions(submissions, batch_size=5000, replace=True):
+    """(Re)build the fingerprints of `submissions`. Returns the number of rows written.
+
+    replace=False skips deleting old rows, for submissions that were just inserted.
+    """
+    submissions = list(submissions)
+    if replace:
+        AnswerFingerprint.objects.filter(submission_id__in=[s.id for s in submissions]).delete()
+    rows = [row for submission in submissions for row in fingerprint_rows(submission)]
+    AnswerFingerprint.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rank_pairs(docs, limit=50, min_shared=3, max_doc_freq=MAX_DOC_FREQ):
+    """Rank similar document pairs from an inverted index.
+
+    `docs` maps a document key (any hashable; pairs are only formed between
+    keys with the same first element, e.g. the question) to its fingerprint
+    set. Returns [(similarity, shared, key_a, key_b)], most similar first,
+    with similarity = shared / the smaller count of informative (not too
+    common) fingerprints.
+    """
+    postings = defaultdict(list)
+    group_sizes = Counter()
+    for key, hashes in docs.items():
+        group_sizes[key[0]] += 1
+        for h in hashes:
+            postings[(key[0], h)].append(key)
+
+    shared = Counter()
+    informative = Counter()  # Fingerprints per document that survive the frequency cap
+    for (group, _), keys in postings.items():
+        if len(keys) > max(2, min(max_doc_freq, MAX_DOC_SHARE * group_sizes[group])):
+            continue
+        informative.update(keys)
+        if len(keys) < 2:
+            continue
+        keys.sort()
+        for i, a in enumerate(keys):
+            for b in keys[i + 1:]:
+                shared[a, b] += 1
+
+    ranked = []
+    for (a, b), count in shared.items():
+        if count >= min_shared:
+            ranked.append((count / min(informative[a], informative[b]), count, a, b))
+    ranked.sort(key=lambda r: (-r[0], -r[1]))
+    return ranked[:limit]
+
+
+def assignment_report(assignment, limit=50, min_shared=3):
+    """Ranked similar answer pairs for one assignment, read from the fingerprint index.
+
+    Returns [{'similarity', 'shared', 'question_id', 'a', 'b'}] where a and b
+    are Submission objects with student loaded.
+    """
+    docs = defaultdict(set)
+    for submission_id, question_id, h in AnswerFingerprint.objects.filter(assignment=assignment).values_list(
+        'submission_id', 'question_id', 'hash',
+    ).iterator(chunk_size=10000):
+        docs[question_id, submission_id].add(h)
+    ranked = rank_pairs(docs, limit=limit, min_shared=min_shared)
+    submissions = Submission.objects.select_related('student').in_bulk(
+        {key[1] for _, _, a, b in ranked for key in (a, b)}
+    )
+    return [
+        {'similarity': similarity, 'shared': count, 'question_id': a[0], 'a': submissions[a[1]], 'b': submissions[b[1]]}
+        for similarity, count, a, b in ranked
+        if a[1] in submissions and b[1] in submissions
+        and submissions[a[1]].student_id != submissions[b[1]].student_id  # Own resubmissions aren't copying
+    ]
@@ -0,0 +1,110 @@
+"""Incremental maintenance of AssignmentStats.
+
+Views call these right after the write they describe, so teacher pages read
+one pre-aggregated row per assignment instead of scanning Submission.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import AssignmentStats, Submission, median_from_counts
+
+
+def _apply(assignment_id, submitted=0, remove_score=None, add_score=None):
+    _apply_many(assignment_id, submitted, [(remove_score, add_score)])
+
+
+def _apply_many(assignment_id, submitted, score_changes):
+    """Apply a submitted-count delta and (old score, new score) changes under one row lock."""
+    with transaction.atomic():
+        stats, _ = AssignmentStats.objects.select_for_update().get_or_create(assignment_id=assignment_id)
+        stats.submitted_count = max(0, stats.submitted_count + submitted)
+        counts = stats.score_counts
+        for remove_score, add_score in score_changes:
+            if remove_score is not None:
+                key = str(remove_score)
+                counts[key] = counts.get(key, 0) - 1
+                if counts[key] <= 0:
+                    counts.pop(key)
+                stats.graded_count = max(0, stats.graded_count - 1)
+                stats.score_total -= remove_score
+            if add_score is not None:
+                key = str(add_score)
+                counts[key] = counts.get(key, 0) + 1
+                stats.graded_count += 1
+                stats.score_total += add_score
+        stats.save()
+
+
+def record_submission(submission):
+    if submission.score is None and AssignmentStats.objects.filter(assignment_id=submission.assignment_id).update(
+        submitted_count=F('submitted_count') + 1, updated_at=timezone.now(),
+    ):
+        return  # The common case, one UPDATE with no row lock held across round-trips
+    _apply(submission.assignment_id, submitted=1, add_score=submission.score)
+
+
+def record_grade(submission, previous_score):
+    if previous_score != submission.score:
+        _apply(submission.assignment_id, remove_score=previous_score, add_score=submission.score)
+
+
+def record_grades(changes):
+    """Batch form of record_grade: [(submission, previous_score)], one locked update per assignment."""
+    by_assignment = {}
+    for submission, previous_score in changes:
+        if previous_score != submission.score:
+            by_assignment.setdefault(submission.assignment_id, []).append((previous_score, submission.score))
+    for assignment_id, score_changes in by_assignment.items():
+        _apply_many(assignment_id, 0, score_changes)
+
+
+def record_deletion(submission):
+    _apply(submission.assignment_id, submitted=-1, remove_score=submission.score)
+
+
+def rebuild(assignment_ids=None):
+    """Recompute stats from Submission in one grouped query. Returns the number of rows written."""
+    submissions = Submission.objects.all()
+    if assignment_ids is not None:
+        submissions = submissions.filter(assignment_id__in=assignment_ids)
+    rows = {}
+    for assignment_id, score, count in (
+        submissions.values_list('assignment_id', 'score').annotate(n=Count('id')).order_by()
+    ):
+        stats = rows.setdefault(assignment_id, AssignmentStats(assignment_id=assignment_id, score_counts={}))
+        stats.submitted_count += count
+        if score is not None:
+            stats.graded_count += count
+            stats.score_total += score * count
+            stats.score_counts[str(score)] = count
+    with transaction.atomic():
+        existing = AssignmentStats.objects.all()
+        if assignment_ids is not None:
+            existing = existing.filter(assignment_id__in=assignment_ids)
+        existing.delete()
+        AssignmentStats.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def topic_summary(assignments):
+    """Merge per-assignment stats (assignments fetched with select_related('stats')) by topic."""
+    topics = {}
+    for ass in assignments:
+        stats = getattr(ass, 'stats', None)  # Missing row (no submissions yet) -> None
+        entry = topics.setdefault(ass.topic, {
+            'topic': ass.topic, 'assignments': 0, 'submitted': 0, 'graded': 0, 'score_total': 0, 'score_counts': {},
+        })
+        entry['assignments'] += 1
+        if stats is None:
+            continue
+        entry['submitted'] += stats.submitted_count
+        entry['graded'] += stats.graded_count
+        entry['score_total'] += stats.score_total
+        for score, count in stats.score_counts.items():
+            entry['score_counts'][score] = entry['score_counts'].get(score, 0) + count
+    for entry in topics.values():
+        entry['pending'] = entry['submitted'] - entry['graded']
+        entry['average'] = entry['score_total'] / entry['graded'] if entry['graded'] else None
+        entry['median'] = median_from_counts(entry['score_counts'])
+    return sorted(topics.values(), key=lambda e: e['topic'])
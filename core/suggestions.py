@@ -0,0 +1,209 @@
+"""Score suggestions for grade_submission from similar, already-graded answers.
+
+Every answer is turned into a hashed bag of 1-3-grams over the normalized
+token stream of core.similarity (so renaming a variable changes nothing),
+log-scaled and L2-normalized. Each question keeps the graded answers as
+rows of a CSR matrix cached per worker; cosine similarity to a new answer
+is then a single sparse matrix-vector product, and the suggestion is the
+similarity-weighted mean score of the K nearest rows.
+
+The cache is refreshed incrementally on use: one indexed query returns only
+the submissions whose row changed (Submission.updated_at) since the last
+sync, which picks up grades, regrades and resubmissions, and only answers
+that are new (or have a new version) are fetched and featurized. Every
+FULL_SYNC_SECONDS a sync re-reads all graded ids instead, for deletions and
+edited assignment questions. Each question's index has its own lock, held
+only for in-memory work, never around a query.
+"""
+import math
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Submission, parse_answers
+from .similarity import tokens
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency; pure-Python dot products are used without it
+    np = None
+
+DIMENSIONS = 1 << 18
+NGRAMS = (1, 2, 3)
+K = 5
+MIN_SIMILARITY = 0.2  # Neighbours below this say nothing about the answer
+FULL_SYNC_SECONDS = 600
+# Re-read rows this much older than the last sync too: a transaction can commit after a later one's sync
+WATERMARK_SLACK = timedelta(seconds=60)
+
+_indexes = {}  # question_id -> QuestionIndex
+
+
+def features(code):
+    """{hashed feature: weight}, L2-normalized, for one answer."""
+    toks = tokens(code)
+    counts = Counter()
+    for n in NGRAMS:
+        for i in range(len(toks) - n + 1):
+            counts[zlib.crc32('\x1f'.join(toks[i:i + n]).encode('utf-8')) % DIMENSIONS] += 1
+    weights = {f: 1.0 + math.log(c) for f, c in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {f: w / norm for f, w in weights.items()}
+
+
+class QuestionIndex:
+    """Graded answers to one question as a growing CSR matrix (rows = submissions)."""
+
+    def __init__(self, question_id):
+        self.question_id = question_id
+        self.ids = array('q')            # submission id per row
+        self.scores = array('d')         # current score per row, NaN once ungraded/deleted
+        self.row_of = {}                 # submission id -> its current row (a resubmission gets a new one)
+        self.version_of = {}             # submission id -> Submission.version featurized in that row
+        self.indptr = array('q', [0])
+        self.indices = array('i')        # feature per non-zero (< DIMENSIONS, so 4 bytes suffice)
+        self.data = array('f')           # weight per non-zero
+        self._csr = None                 # NumPy views, rebuilt after appends
+        self.lock = threading.Lock()     # Arrays must not grow while a thread holds views of them
+        self.watermark = None            # Start time of the last sync; None = never synced
+        self.full_synced = 0.0           # time.monotonic() of the last full sync
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sync(self):
+        """Refresh scores and append newly graded answers (and new versions of resubmitted ones)."""
+        started, now = timezone.now(), time.monotonic()
+        full = self.watermark is None or now - self.full_synced > FULL_SYNC_SECONDS
+        rows = Submission.objects.filter(assignment__questions=self.question_id)
+        if full:
+            rows = rows.filter(score__isnull=False)
+        else:
+            rows = rows.filter(updated_at__gt=self.watermark - WATERMARK_SLACK)
+        changed = {
+            submission_id: (score, version)
+            for submission_id, score, version in rows.values_list('id', 'score', 'version').distinct()
+        }
+        fresh = [i for i, (score, version) in changed.items() if score is not None and self.version_of.get(i) != version]
+        vectors = [
+            (submission_id, version, features(str(parse_answers(raw).get(str(self.question_id)) or '')))
+            for submission_id, raw, version in Submission.objects.filter(id__in=fresh).values_list(
+                'id', 'answers', 'version',
+            )
+        ] if fresh else []
+
+        with self.lock:
+            if full:  # Anything not graded any more (or deleted) drops out
+                for row, submission_id in enumerate(self.ids):
+                    if self.row_of.get(submission_id) == row and submission_id not in changed:
+                        self.scores[row] = math.nan
+            for submission_id, (score, version) in changed.items():
+                row = self.row_of.get(submission_id)
+                if row is not None:
+                    current = score is not None and version == self.version_of[submission_id]
+                    self.scores[row] = score if current else math.nan
+            for submission_id, version, vector in vectors:
+                if self.version_of.get(submission_id) == version:  # Appended by a concurrent sync
+                    continue
+                self.version_of[submission_id] = version
+                old = self.row_of.pop(submission_id, None)
+                if old is not None:  # An older version's row stays behind as NaN
+                    self.scores[old] = math.nan
+                if not vector:  # Blank or comment-only answer
+                    continue
+                self._csr = None  # Release the NumPy views; arrays can't grow while exported
+                self.row_of[submission_id] = len(self.ids)
+                self.ids.append(submission_id)
+                self.scores.append(changed[submission_id][0] if changed[submission_id][1] == version else math.nan)
+                self.indices.extend(vector.keys())
+                self.data.extend(vector.values())
+                self.indptr.append(len(self.indices))
+            self.watermark = max(self.watermark or started, started)
+            if full:
+                self.full_synced = now
+
+    def similarities(self, vector):
+        """Cosine similarity of `vector` to every row (rows are unit-length, so a dot product)."""
+        if np is not None:
+            if self._csr is None:
+                self._csr = (
+                    np.frombuffer(self.indptr, dtype=np.int64),
+                    np.frombuffer(self.indices, dtype=np.int32),
+                    np.frombuffer(self.data, dtype=np.float32),
+                )
+            indptr, indices, data = self._csr
+            query = np.zeros(DIMENSIONS, dtype=np.float32)
+            query[list(vector.keys())] = list(vector.values())
+            # The sparse mat-vec: gather the query at every non-zero, then sum per row (rows are never empty)
+            return np.add.reduceat(data * query[indices], indptr[:-1]).astype(np.float64)
+        return [
+            sum(self.data[j] * vector.get(self.indices[j], 0.0) for j in range(self.indptr[r], self.indptr[r + 1]))
+            for r in range(len(self.ids))
+        ]
+
+    def neighbours(self, code, exclude=None, k=K):
+        """[(similarity, submission_id, score)] of the k most similar graded answers."""
+        vector = features(code)
+        with self.lock:
+            return self._neighbours(vector, exclude, k)
+
+    def _neighbours(self, vector, exclude, k):
+        if not len(self):
+            return []
+        sims = self.similarities(vector)
+        if np is not None:
+            sims = np.where(np.isnan(np.frombuffer(self.scores, dtype=np.float64)), -1.0, sims)
+            if exclude in self.row_of:
+                sims[self.row_of[exclude]] = -1.0
+            rows = np.argpartition(-sims, k)[:k] if len(sims) > k else range(len(sims))
+        else:
+            rows = range(len(sims))
+        candidates = [
+            (float(sims[row]), self.ids[row], self.scores[row])
+            for row in rows
+            if sims[row] >= MIN_SIMILARITY and not math.isnan(self.scores[row]) and self.ids[row] != exclude
+        ]
+        return sorted(candidates, reverse=True)[:k]
+
+
+def neighbours(question_id, code, exclude=None, k=K):
+    """Sync the worker's index for `question_id` and return the k nearest graded answers to `code`."""
+    index = _indexes.get(question_id) or _indexes.setdefault(question_id, QuestionIndex(question_id))
+    index.sync()
+    return index.neighbours(code, exclude=exclude, k=k)
+
+
+def suggest(submission, k=K):
+    """Suggested score for `submission` from its nearest graded neighbours, per answered question.
+
+    Returns None when nothing similar has been graded yet, else
+    {'score': int, 'questions': [{'question_id', 'score', 'neighbours': [(similarity, submission_id, score)]}]}.
+    """
+    answers = parse_answers(submission.answers)
+    if not answers:
+        return None
+    linked = set(submission.assignment.questions.values_list('id', flat=True))
+    per_question = []
+    for key, code in answers.items():
+        if not str(key).isdigit() or int(key) not in linked or not str(code or '').strip():
+            continue
+        nearest = neighbours(int(key), str(code), exclude=submission.id, k=k)
+        if not nearest:
+            continue
+        weight = sum(sim for sim, _, _ in nearest)
+        per_question.append({
+            'question_id': int(key),
+            'score': sum(sim * score for sim, _, score in nearest) / weight,
+            'neighbours': nearest,
+        })
+    if not per_question:
+        return None
+    return {
+        'score': round(sum(q['score'] for q in per_question) / len(per_question)),
+        'questions': per_question,
+    }
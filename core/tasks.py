@@ -0,0 +1,50 @@
+"""Job handlers for core.jobs. Imported from CoreConfig.ready() so every process registers them."""
+import logging
+
+from . import adaptive, autograder, jobs
+from .models import Submission, User
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE_FOLLOWUPS = 'adaptive.followups'
+AUTOGRADE = 'autograder.submissions'
+
+
+def enqueue_followups(submissions, teacher):
+    """Queue adaptive follow-up generation for already-graded submissions."""
+    ids = [s.id for s in submissions if s.score is not None]
+    if ids:
+        return jobs.enqueue(ADAPTIVE_FOLLOWUPS, {'submission_ids': ids, 'teacher_id': teacher.id})
+
+
+@jobs.handler(ADAPTIVE_FOLLOWUPS)
+def generate_adaptive_followups(payload):
+    # Re-read the scores: the submission may have been regraded since the job was queued.
+    # The registry makes this idempotent, so a retry after a partial failure is safe.
+    submissions = list(
+        Submission.objects.filter(id__in=payload['submission_ids'], score__isnull=False).select_related('assignment')
+    )
+    teacher = User.objects.get(id=payload['teacher_id'])
+    results = adaptive.generate_followups(submissions, teacher)
+    created = sum(1 for outcome, _ in results.values() if outcome == adaptive.CREATED)
+    logger.info('Adaptive follow-ups: %s created for %s submissions', created, len(submissions))
+    return results
+
+
+def enqueue_autograde(submissions):
+    """Queue sandboxed auto-grading for new submissions."""
+    ids = [s.id for s in submissions]
+    if ids:
+        return jobs.enqueue(AUTOGRADE, {'submission_ids': ids})
+
+
+@jobs.handler(AUTOGRADE)
+def autograde_submissions(payload):
+    # Only still-ungraded ones: a teacher may have graded by hand before the worker got here
+    ids = list(Submission.objects.filter(id__in=payload['submission_ids'], score__isnull=True).values_list('id', flat=True))
+    report = autograder.autograde_ids(ids)
+    logger.info(
+        'Auto-graded %s submissions (%s runs, %s timeouts) in %.2fs',
+        report['submissions'], report['runs'], report['timeouts'], report['seconds'],
+    )
+    return report
@@ -14,16 +14,23 @@ urlpatterns = [
     path('teacher/create-subject/', views.create_subject, name='create_subject'),
     path('teacher/create-assignment/<int:subject_id>/', views.create_assignment, name='create_assignment'),
     path('teacher/grade/<int:submission_id>/', views.grade_submission, name='grade_submission'),
+    path('teacher/subject/<int:subject_id>/batch-grade/', views.batch_grade, name='batch_grade'),
+    path('teacher/batch-grade/', views.batch_grade_api, name='batch_grade_api'),
     path('student-dashboard/', views.student_dashboard, name='student_dashboard'),
     path('student/enroll/', views.enroll_subject, name='enroll_subject'),
     path('student/submit/<int:assignment_id>/', views.submit_assignment, name='submit_assignment'),
+    path('student/submit/<int:assignment_id>/draft/', views.save_draft, name='save_draft'),
     path('load-questions/<int:subject_id>/', views.load_questions, name='load_questions'),
+    path('search-questions/<int:subject_id>/', views.search_questions, name='search_questions'),
     path('teacher/delete-assignment/<int:assignment_id>/', views.delete_assignment, name='delete_assignment'),
+    path('teacher/assignment/<int:assignment_id>/similarity/', views.similarity_report, name='similarity_report'),
     path('submit/<int:assignment_id>/', views.submit_assignment, name='submit_assignment'),
     path('student/delete-submission/<int:submission_id>/', views.delete_submission, name='delete_submission'),
     path('delete-submission/<int:submission_id>/', views.delete_submission, name='delete_submission'),
     path('student/subject/<int:subject_id>/', views.subject_detail, name='subject_detail'), 
     path('teacher/subject/<int:subject_id>/', views.teacher_subject_detail, name='teacher_subject_detail'),
+    path('teacher/subject/<int:subject_id>/export/', views.export_gradebook, name='export_gradebook'),
+    path('teacher/subject/<int:subject_id>/gradebook/', views.gradebook_matrix, name='gradebook_matrix'),
     path('teacher/delete-subject/<int:subject_id>/', views.delete_subject, name='delete_subject'),
     
 ]
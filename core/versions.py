@@ -0,0 +1,129 @@
+"""Version history of resubmitted answers.
+
+Submission.answers always holds the latest version, so grading and every
+list read it directly and pay nothing for history. SubmissionVersion rows
+keep the older ones compactly: a version stores a zlib-compressed delta
+against the one before it (per question: unchanged answers are omitted,
+changed ones are line-level edit operations), and every SNAPSHOT_EVERY-th
+version stores the full answers instead. Rebuilding any version is one
+query for at most SNAPSHOT_EVERY rows from the preceding snapshot forward.
+
+History starts on the first resubmission: a submission that was never
+resubmitted has no rows, so the submit path is untouched.
+"""
+import difflib
+import json
+import zlib
+
+from .models import SubmissionVersion, parse_answers
+
+SNAPSHOT_EVERY = 10  # Versions 1, 11, 21, ... are full snapshots
+
+
+def _pack(obj):
+    return zlib.compress(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def is_snapshot(number):
+    return (number - 1) % SNAPSHOT_EVERY == 0
+
+
+def diff(old, new):
+    """Delta turning answers `old` into `new` ({question id: text} both).
+
+    {qid: None} drops an answer, {qid: ['s', text]} sets it, and
+    {qid: ['d', [[i1, i2, [lines]], ...]]} replaces old lines i1:i2 with
+    `lines`, applied from the last operation backwards.
+    """
+    delta = {}
+    for qid in old.keys() - new.keys():
+        delta[qid] = None
+    for qid, text in new.items():
+        before = old.get(qid)
+        if before == text:
+            continue
+        if not isinstance(before, str) or not isinstance(text, str):
+            delta[qid] = ['s', text]
+            continue
+        a, b = before.splitlines(keepends=True), text.splitlines(keepends=True)
+        ops = [
+            [i1, i2, b[j1:j2]]
+            for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+            if tag != 'equal'
+        ]
+        delta[qid] = ['d', ops]
+    return delta
+
+
+def patch(old, delta):
+    """Apply a diff() delta to answers `old`; returns the new answers."""
+    new = dict(old)
+    for qid, change in delta.items():
+        if change is None:
+            new.pop(qid, None)
+        elif change[0] == 's':
+            new[qid] = change[1]
+        else:
+            lines = str(new.get(qid, '')).splitlines(keepends=True)
+            for i1, i2, replacement in reversed(change[1]):
+                lines[i1:i2] = replacement
+            new[qid] = ''.join(lines)
+    return new
+
+
+def record(submission, answers, submitted_at):
+    """Store history for replacing `submission`'s answers with `answers`; sets and returns the new version number.
+
+    Call inside the transaction that saves the submission, with the row
+    locked, before its answers and grade change. The outgoing version keeps
+    the grade it had.
+    """
+    current = submission.version
+    kept = SubmissionVersion.objects.filter(submission=submission, number=current).update(
+        score=submission.score, feedback=submission.feedback,
+    )
+    if not kept:  # First resubmission: the original answers become version 1
+        SubmissionVersion.objects.create(
+            submission=submission, number=current, is_snapshot=True, data=_pack(parse_answers(submission.answers)),
+            submitted_at=submission.submitted_at, score=submission.score, feedback=submission.feedback,
+        )
+    number = current + 1
+    snapshot = is_snapshot(number)
+    SubmissionVersion.objects.create(
+        submission=submission, number=number, is_snapshot=snapshot,
+        data=_pack(answers if snapshot else diff(parse_answers(submission.answers), answers)),
+        submitted_at=submitted_at,
+    )
+    submission.version = number
+    return number
+
+
+def answers_at(submission, number):
+    """{question id: text} of version `number`; the latest is read straight from the submission."""
+    if number == submission.version:
+        return parse_answers(submission.answers)
+    start = number - (number - 1) % SNAPSHOT_EVERY
+    rows = list(
+        SubmissionVersion.objects.filter(submission=submission, number__gte=start, number__lte=number)
+        .order_by('number').values_list('is_snapshot', 'data')
+    )
+    if len(rows) != number - start + 1 or not rows[0][0]:
+        raise SubmissionVersion.DoesNotExist(f'Version {number} of submission {submission.pk} is incomplete')
+    answers = _unpack(rows[0][1])
+    for _, data in rows[1:]:
+        answers = patch(answers, _unpack(data))
+    return answers
+
+
+def history(submission):
+    """[{'number', 'submitted_at', 'score', 'is_snapshot'}] of every version, oldest first, without decoding any."""
+    if submission.version == 1:
+        return []
+    return list(
+        SubmissionVersion.objects.filter(submission=submission).order_by('number')
+        .values('number', 'submitted_at', 'score', 'is_snapshot')
+    )
@@ -1,17 +1,21 @@
-import random
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, CreateView, UpdateView
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.db import router
+from django.db.models import Q, Prefetch
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, SubjectForm, AssignmentForm, SubmissionForm, EnrollmentForm
-from .models import User, Subject, Enrollment, Question, Assignment, Submission
+from .models import User, Subject, Enrollment, Question, Assignment, Submission, SubmissionVersion, parse_answers
+from .question_bank import get_question_bank
+from . import adaptive, dashboard_cache, drafts, export, grading, ingest, search, similarity, stats, suggestions, versions
+from .gradebook import build_gradebook, html_rows
+from .inbox import attach_inbox_previews, student_inbox
+from .pagination import filter_submissions, keyset_page
+from .routers import primary_reads, replica_reads
 import csv
-import os
-from django.conf import settings
 from datetime import datetime, timedelta
 from django.contrib.auth import logout  
 from django.views.decorators.http import require_http_methods
@@ -70,36 +74,41 @@ def logout_view(request):
     logout(request)
     return redirect('home')
 
-@login_required
-def teacher_dashboard(request):
-    # Fixed: Use 'teacher' (singular ForeignKey) instead of 'teachers' (non-existent ManyToMany)
-    subjects = Subject.objects.filter(teacher=request.user).order_by('name')
-    
-    # Assignments created by this teacher
-    assignments = Assignment.objects.filter(
-        created_by=request.user
-    ).prefetch_related('questions').order_by('due_date')  # Added order_by for better UX
+def preview_questions_prefetch():
+    # One query for all assignments' questions, ordered by id like questions.first() was
+    return Prefetch('questions', queryset=Question.objects.order_by('id'), to_attr='ordered_questions')
 
-    # Preview logic (your existing code, unchanged)
+
+def attach_question_previews(assignments, max_length=50, suffix='...'):
+    """Set display_question/display_hint from the prefetched first question (no extra queries)."""
     for ass in assignments:
-        questions = getattr(ass, 'questions', None)
-        if questions and questions.exists():
-            first_q = questions.first()
-            ass.display_question = f"{first_q.question[:50]}..." if first_q.question else "No question"
+        questions = getattr(ass, 'ordered_questions', None)
+        if questions:
+            first_q = questions[0]
+            ass.display_question = f"{first_q.question[:max_length]}{suffix}" if first_q.question else "No question"
             ass.display_hint = first_q.hint or ""
         else:
             ass.display_question = "No question available"
             ass.display_hint = ""
+    return assignments
 
-    # Submissions for teacher's assignments
-    submissions = Submission.objects.filter(
-        assignment__created_by=request.user
-    ).select_related('assignment', 'student').order_by('-submitted_at')  # Added select_related and order_by for efficiency/UX
 
+def seconds_until_next_due(assignments):
+    """TTL for a cached fragment listing open assignments: expire when the first one closes."""
+    now = timezone.now()
+    upcoming = [ass.due_date for ass in assignments if ass.due_date > now]
+    return (min(upcoming) - now).total_seconds() if upcoming else None
+
+
+@login_required
+@replica_reads
+def teacher_dashboard(request):
+    # Fixed: Use 'teacher' (singular ForeignKey) instead of 'teachers' (non-existent ManyToMany)
+    subjects = Subject.objects.filter(teacher=request.user).order_by('name')
+
+    # Submissions are listed (filtered and paginated) per subject, on teacher_subject_detail
     return render(request, 'core/teacher_dashboard.html', {
         'subjects': subjects,
-        'assignments': assignments,
-        'submissions': submissions,
     })
 
 @login_required
@@ -170,9 +179,8 @@ def create_assignment(request, subject_id):
                 q_obj, _ = Question.objects.get_or_create(
                     subject=subject,
                     topic=topic,
-                    level=q['level'],
                     question=q['question'],
-                    hint=q['hint']
+                    defaults={'level': q['level'], 'hint': q['hint']}
                 )
                 assignment.questions.add(q_obj)
 
@@ -200,7 +208,6 @@ def create_assignment(request, subject_id):
 
 
 import json
-import random
 from datetime import timedelta
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
@@ -210,6 +217,7 @@ from django.contrib.auth.decorators import login_required
 from core.models import Submission, Assignment, Question  # Add User if needed
 
 @login_required
+@primary_reads  # Leads into a write: never grade from a lagging copy
 def grade_submission(request, submission_id):
     submission = get_object_or_404(
         Submission,
@@ -220,69 +228,20 @@ def grade_submission(request, submission_id):
     assignment = submission.assignment
     
     if request.method == 'POST':
-        score_input = request.POST.get('score', '')
-        feedback = request.POST.get('feedback', '').strip()
-        
-        try:
-            if score_input:
-                score_value = float(score_input)
-                submission.score = max(0, min(10, int(score_value)))
-            else:
-                submission.score = None
-        except ValueError:
-            messages.error(request, 'Invalid score. Enter a number between 0-10.')
+        # Same path as batch grading: one transaction for the score, stats and mastery;
+        # follow-up generation runs in the background worker (manage.py run_worker)
+        result = grading.apply_grades(request.user, [{
+            'submission_id': submission.id,
+            'score': request.POST.get('score', ''),
+            'feedback': request.POST.get('feedback', ''),
+        }], queue_followups=True)
+        if result['errors']:
+            messages.error(request, next(iter(result['errors'].values())))
         else:
-            submission.feedback = feedback
-            submission.graded_at = timezone.now()
-            submission.save()
+            submission.refresh_from_db()
             messages.success(request, f'Graded {submission.student.username}\'s submission: {submission.score}/10')
-            
             if submission.score is not None:
-                # Level based on score (low <4, medium 4-6, high 7+)
-                if submission.score < 4:
-                    level = 'low'
-                elif submission.score < 7:
-                    level = 'medium'
-                else:
-                    level = 'high'
-                
-                # Specific dupe check: Per topic + level + student (no block if new level)
-                existing_adaptive = Assignment.objects.filter(
-                    topic__iexact=submission.assignment.topic,
-                    description__icontains=f"Level: {level}",
-                    is_adaptive=True,
-                    students=submission.student  # NEW: Student-specific
-                ).exists()
-                
-                if not existing_adaptive:  # Create if no match
-                    adaptive_questions = Question.objects.filter(
-                        topic__iexact=submission.assignment.topic,
-                        level__iexact=level
-                    )
-                    
-                    if adaptive_questions.exists():
-                        adaptive_question = random.choice(list(adaptive_questions))
-                        
-                        adaptive_assignment = Assignment.objects.create(
-                            subject=submission.assignment.subject,
-                            topic=submission.assignment.topic,
-                            description=f"Adaptive follow-up on {submission.assignment.topic} (Level: {level})",
-                            announcement_date=timezone.now(),
-                            due_date=timezone.now() + timedelta(days=7),
-                            created_by=request.user,
-                            is_adaptive=True,
-                        )
-                        adaptive_assignment.questions.add(adaptive_question)
-                        
-                        # NEW: Assign to student & auto-pending submission
-                        adaptive_assignment.students.add(submission.student)
-                       
-                        
-                        messages.success(request, f'Adaptive {level}-level question assigned to {submission.student.username}!')
-                    else:
-                        messages.warning(request, f'No {level}-level questions for {submission.assignment.topic}.')
-                else:
-                    messages.info(request, f'Low-level adaptive already assigned to {submission.student.username}.')
+                messages.info(request, f'Adaptive follow-up queued for {submission.student.username}.')
         
         if submission.score is not None:
             return redirect('core:teacher_subject_detail', subject_id=submission.assignment.subject.id)
@@ -292,41 +251,113 @@ def grade_submission(request, submission_id):
         parsed_answers = json.loads(submission.answers) if submission.answers else {}
     except json.JSONDecodeError:
         parsed_answers = {'Error': 'Invalid answers format'}
+
+    # Earlier versions of a resubmission: listed from metadata, rebuilt only when one is opened (?version=N)
+    history = versions.history(submission)
+    shown_version = None
+    requested = request.GET.get('version', '')
+    if requested.isdigit() and 0 < int(requested) < submission.version:
+        try:
+            shown_version = {'number': int(requested), 'answers': versions.answers_at(submission, int(requested))}
+        except SubmissionVersion.DoesNotExist:
+            messages.warning(request, f'Version {requested} can no longer be rebuilt; showing the latest answers.')
     
+    # Score proposed from the most similar graded answers (core/suggestions.py)
+    suggestion = suggestions.suggest(submission)
+    if suggestion:
+        usernames = dict(Submission.objects.filter(
+            id__in={sid for q in suggestion['questions'] for _, sid, _ in q['neighbours']}
+        ).values_list('id', 'student__username'))
+        for q in suggestion['questions']:
+            q['neighbours'] = [
+                {'similarity': sim, 'submission_id': sid, 'score': score, 'username': usernames.get(sid, '?')}
+                for sim, sid, score in q['neighbours']
+            ]
+
     context = {
         'submission': submission,
         'assignment': assignment,
         'student_name': submission.student.get_full_name() or submission.student.username,
         'parsed_answers': parsed_answers,
         'max_score': 10,
+        'suggestion': suggestion,
+        'history': history,
+        'shown_version': shown_version,
     }
     return render(request, 'core/grade_submission.html', context)
 
 @login_required
-def student_dashboard(request):
-    enrollments = Enrollment.objects.filter(student=request.user).select_related('subject')
-    available_assignments = Assignment.objects.filter(
-        subject__in=enrollments.values('subject'),
-        due_date__gt=timezone.now(),  # Fixed: Use timezone.now()
-    ).select_related('subject').prefetch_related('questions')
-
-    for ass in available_assignments:
-        questions = getattr(ass, 'questions', None)
-        if questions and questions.exists():
-            first_q = questions.first()
-            ass.display_question = f"{first_q.question[:50]}..." if first_q.question else "No question"
-            ass.display_hint = first_q.hint or ""
-        else:
-            ass.display_question = "No question available"
-            ass.display_hint = ""
+@primary_reads
+def batch_grade(request, subject_id):
+    """Grade a page of a subject's ungraded submissions in one POST."""
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user)
+
+    if request.method == 'POST':
+        entries = [
+            {
+                'submission_id': submission_id,
+                'score': request.POST.get(f'score_{submission_id}', ''),
+                'feedback': request.POST.get(f'feedback_{submission_id}', ''),
+            }
+            for submission_id in request.POST.getlist('submission_ids')
+            if request.POST.get(f'score_{submission_id}', '').strip()  # Left blank = skip
+        ]
+        result = grading.apply_grades(request.user, entries)
+        created = sum(1 for outcome, _ in result['followups'].values() if outcome == adaptive.CREATED)
+        messages.success(request, f"Graded {len(result['graded'])} submissions; {created} adaptive follow-ups assigned.")
+        if result['errors']:
+            messages.error(request, f"{len(result['errors'])} entries skipped: " + '; '.join(
+                f'#{key}: {message}' for key, message in result['errors'].items()
+            ))
+        return redirect('core:batch_grade', subject_id=subject.id)
 
-    submissions = Submission.objects.filter(student=request.user)
-    return render(request, 'core/student_dashboard.html', {
-        'enrollments': enrollments,
-        'available_assignments': available_assignments,
+    submissions = Submission.objects.filter(
+        assignment__subject=subject, score__isnull=True, has_content=True
+    ).select_related('assignment', 'student')
+    submissions, next_cursor = keyset_page(submissions, request.GET.get('cursor'), per_page=100)
+    return render(request, 'core/batch_grade.html', {
+        'subject': subject,
         'submissions': submissions,
+        'next_cursor': next_cursor,
     })
 
+
+@login_required
+@require_http_methods(["POST"])
+def batch_grade_api(request):
+    """JSON: {"grades": [{"submission_id": 1, "score": 7, "feedback": "..."}, ...]}"""
+    try:
+        payload = json.loads(request.body or b'{}')
+        entries = payload['grades']
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Expected {"grades": [{...}, ...]}'}, status=400)
+
+    result = grading.apply_grades(request.user, entries)
+    return JsonResponse({
+        'success': True,
+        'graded': result['graded'],
+        'errors': {str(key): message for key, message in result['errors'].items()},
+        'followups': {
+            str(key): {'outcome': outcome, 'level': level} for key, (outcome, level) in result['followups'].items()
+        },
+    })
+
+
+@login_required
+@replica_reads
+def student_dashboard(request):
+    def build():
+        enrollments = Enrollment.objects.filter(student=request.user).select_related('subject')
+        # Only the enrollments are listed: enrolling and renaming a subject bump the versions,
+        # and nothing here changes with the clock, so no TTL
+        subject_ids = [e.subject_id for e in enrollments]
+        return {'enrollments': enrollments}, subject_ids, None
+
+    body = dashboard_cache.render_fragment(request, 'student_dashboard', 'core/student_dashboard_body.html', build)
+    return render(request, 'core/student_dashboard.html', {'body': body})
+
 @login_required
 def enroll_subject(request):
     if request.method == 'POST':
@@ -349,6 +380,7 @@ def enroll_subject(request):
 
 
 @login_required
+@primary_reads
 def submit_assignment(request, assignment_id):
     # Secure access: Ensure student is enrolled in the subject
     assignment = get_object_or_404(
@@ -356,19 +388,11 @@ def submit_assignment(request, assignment_id):
         id=assignment_id,
         subject__enrollment__student=request.user
     )
-    
-    # Check if already submitted
-    submission = Submission.objects.filter(
-        student=request.user, 
-        assignment=assignment
-    ).first()
-    is_submitted = submission is not None
-    print(f"DEBUG: Already submitted? {is_submitted}")
 
     # Get questions (teacher-selected or fallback)
     selected_questions = list(assignment.questions.all())
     if not selected_questions:
-        selected_questions = list(Question.objects.filter(topic=assignment.topic))
+        selected_questions = list(Question.objects.filter(topic=assignment.topic, is_retired=False))
         if selected_questions:
             messages.warning(request, f"No questions linked to this assignment. Showing topic-based fallback for '{assignment.topic}'.")
             no_questions = False
@@ -390,53 +414,40 @@ def submit_assignment(request, assignment_id):
     
     due_date_passed = assignment.due_date < timezone.now() if hasattr(assignment, 'due_date') else False
     
-    # Parse answers for template if submitted (or from POST)
+    # Answers can be changed and resubmitted until the due date (core/versions.py keeps the history)
+    can_resubmit = not due_date_passed
+
+    submission = None
     answers_dict = {}
-    if submission and submission.answers:
-        try:
-            answers_dict = json.loads(submission.answers)
-        except json.JSONDecodeError:
-            answers_dict = {}
-    
-    if request.method == 'POST' and not is_submitted:
+    if request.method == 'POST':
         # Manually collect answers dict {q_id: answer_text}
-        print("DEBUG: POST processing started")
-        answers_dict = {}
-        for q in selected_questions:
-            answer_key = f'answers_{q.id}'
-            raw_answer = request.POST.get(answer_key, '').strip()  
-            answers_dict[str(q.id)] = raw_answer
-            print(f"DEBUG: Q {q.id} key: '{answer_key}', Raw: '{raw_answer}' (len: {len(raw_answer)})")
-
-        # Save if ANY answer has content (non-empty after trim)
-        if any(answers_dict.values()):  # At least one non-empty
-            submission = Submission.objects.create(
-                assignment=assignment,
-                student=request.user,
-                answers=json.dumps(answers_dict),  # Save as JSON string
-                submitted_at=timezone.now()
-            )
-            print(f"DEBUG: Forced save! ID: {submission.id}, Dict: {answers_dict}")
-           
-            is_submitted = True  # Update flag
-            # RELOAD submission for fresh data
-            submission = Submission.objects.filter(
-                student=request.user, 
-                assignment=assignment
-            ).first()
-            
-            # Re-parse answers_dict from new submission
-            if submission and submission.answers:
-                try:
-                    answers_dict = json.loads(submission.answers)
-                except json.JSONDecodeError:
-                    answers_dict = {}
-        #else:
-        #   messages.warning(request, 'No answers provided. Submission not saved.')
-    
+        answers_dict = {str(q.id): request.POST.get(f'answers_{q.id}', '').strip() for q in selected_questions}
+
+        # Save if ANY answer has content (non-empty after trim). No "already submitted?" query first:
+        # the unique (assignment, student) constraint turns a double-click into a no-op (core/ingest.py)
+        if any(answers_dict.values()):
+            autograde = any(q.test_cases for q in selected_questions)
+            submission, created = ingest.submit(assignment, request.user, answers_dict, autograde=autograde)
+            if not created and can_resubmit:
+                submission, changed = ingest.resubmit(submission, answers_dict, autograde=autograde)
+                if changed:
+                    messages.success(request, f'Resubmitted: this is version {submission.version}. Your grade is pending again.')
+            answers_dict = parse_answers(submission.answers)
+
+    if submission is None:
+        # Check if already submitted
+        submission = Submission.objects.filter(student=request.user, assignment=assignment).first()
+        if submission is not None:
+            answers_dict = parse_answers(submission.answers)
+        elif request.method != 'POST':
+            # Resume the autosaved draft; the page's autosave calls skip the enrollment check from here on
+            answers_dict = drafts.load(request.user.id, assignment.id)
+            drafts.allow(request.user.id, assignment.id)
+    is_submitted = submission is not None
+
     # Attach answer to each question object for template (temporary, per-request)
     for q in selected_questions:
-        q.answer = answers_dict.get(str(q.id), request.POST.get(f'answers_{q.id}', '').strip() if request.method == 'POST' else '')
+        q.answer = answers_dict.get(str(q.id), '')
     
     context = {
         'assignment': assignment,
@@ -444,17 +455,35 @@ def submit_assignment(request, assignment_id):
         'no_questions': no_questions,
         'due_date_passed': due_date_passed,
         'is_submitted': is_submitted,
+        'can_resubmit': is_submitted and can_resubmit,
         'submission': submission,
     }
     return render(request, 'core/submit_assignment.html', context)
 
+@login_required
+@require_http_methods(["POST"])
+def save_draft(request, assignment_id):
+    """Autosave from submit_assignment. JSON: {"answers": {"<question id>": "text", ...}}, changed answers only."""
+    try:
+        payload = json.loads(request.body or b'{}')
+        answers = payload['answers']
+        if not isinstance(answers, dict):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Expected {"answers": {...}}'}, status=400)
+    if not drafts.may_draft(request.user, assignment_id):
+        return JsonResponse({'success': False, 'error': 'Drafts are closed for this assignment'}, status=403)
+    drafts.save(request.user.id, assignment_id, answers)  # Buffered; written to the database in batches
+    return JsonResponse({'success': True})
+
 @require_http_methods(["GET"])
+@replica_reads
 def load_questions(request, subject_id):
     subject = get_object_or_404(Subject, id=subject_id, teacher=request.user)
     topic = request.GET.get('topic')
     if not topic:
         return JsonResponse({'success': False, 'error': 'No topic provided'})
-    filtered_questions = Question.objects.filter(subject=subject, topic=topic)
+    filtered_questions = Question.objects.filter(subject=subject, topic=topic, is_retired=False)
     choices = []  
     for q in filtered_questions:
         choices.append({
@@ -468,6 +497,35 @@ def load_questions(request, subject_id):
     })
 
 
+@login_required
+@require_http_methods(["GET"])
+def search_questions(request, subject_id):
+    """Ranked, paginated keyword search over a subject's question bank (?q=&page=)."""
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'success': False, 'error': 'No query provided'})
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+        per_page = min(100, max(1, int(request.GET.get('per_page', 20))))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid page'})
+
+    rows, has_next = search.search_questions(subject, query, page=page, per_page=per_page)
+    return JsonResponse({
+        'success': True,
+        'page': page,
+        'has_next': has_next,
+        'results': [{
+            'value': row['id'],
+            'label': row['question'][:60] + '...' if len(row['question']) > 60 else row['question'],
+            'topic': row['topic'],
+            'level': row['level'],
+            'hint': row['hint'],
+        } for row in rows],
+    })
+
+
 @login_required
 def delete_assignment(request, assignment_id):
     assignment = get_object_or_404(Assignment, id=assignment_id, created_by=request.user)
@@ -500,6 +558,7 @@ def delete_submission(request, submission_id):
     if request.method == 'POST':
         assignment_title = submission.assignment.topic
         submission.delete()
+        stats.record_deletion(submission)
         messages.success(request, f'Submission for "{assignment_title}" deleted successfully.')
         return redirect('core:subject_detail', subject_id=submission.assignment.subject.id)
     
@@ -510,44 +569,41 @@ def delete_submission(request, submission_id):
     })
 
 @login_required
+@replica_reads
 def subject_detail(request, subject_id):
-    # Secure: Ensure user is enrolled in this subject
-    enrollment = get_object_or_404(Enrollment, student=request.user, subject_id=subject_id)
-    subject = enrollment.subject
-
-    # Available assignments for this subject
-    available_assignments = Assignment.objects.filter(
-        subject=subject,
-        due_date__gt=timezone.now(),
-    ).select_related('subject').prefetch_related('questions').order_by('due_date')
-
-    # Preview logic
-    for ass in available_assignments:
-        questions = getattr(ass, 'questions', None)
-        if questions and questions.exists():
-            first_q = questions.first()
-            ass.display_question = f"{first_q.question[:500]}" if first_q.question else "No question"
-            ass.display_hint = first_q.hint or ""
-        else:
-            ass.display_question = "No question available"
-            ass.display_hint = ""
-
-    # Submitted assignments for this subject
-    submissions = Submission.objects.filter(
-        student=request.user,
-        assignment__subject=subject
-    ).select_related('assignment').order_by('-submitted_at')
-
-    return render(request, 'core/subject_detail.html', {
-        'subject': subject,
-        'available_assignments': available_assignments,
-        'submissions': submissions,
-        'enrollment': enrollment,  # Optional, for back link
-    })
+    def build():
+        # Secure: Ensure user is enrolled in this subject (a cached copy exists only if this passed;
+        # un-enrolling bumps the user's cache version)
+        enrollment = get_object_or_404(Enrollment, student=request.user, subject_id=subject_id)
+        subject = enrollment.subject
+
+        # Available assignments for this subject (single query, incl. submission status + preview)
+        available_assignments = attach_inbox_previews(
+            student_inbox(request.user, subject=subject, open_only=True), max_length=500, suffix=''
+        )
 
+        # Submitted assignments for this subject
+        submissions = Submission.objects.filter(
+            student=request.user,
+            assignment__subject=subject
+        ).select_related('assignment').order_by('-submitted_at')
+
+        context = {
+            'subject': subject,
+            'available_assignments': available_assignments,
+            'submissions': submissions,
+            'enrollment': enrollment,  # Optional, for back link
+        }
+        return context, [], seconds_until_next_due(available_assignments)
+
+    body = dashboard_cache.render_fragment(
+        request, 'subject_detail', 'core/subject_detail_body.html', build, subject_id=subject_id
+    )
+    return render(request, 'core/subject_detail.html', {'body': body})
 
 
 @login_required
+@replica_reads
 def teacher_subject_detail(request, subject_id):
     # Fixed: Use 'teacher' (singular ForeignKey) for security check
     subject = get_object_or_404(Subject, id=subject_id, teacher=request.user)
@@ -555,30 +611,89 @@ def teacher_subject_detail(request, subject_id):
     # Generated Assignments for this subject
     assignments = Assignment.objects.filter(
         subject=subject
-    ).select_related('subject').prefetch_related('questions').order_by('due_date')
+    ).select_related('subject', 'stats').prefetch_related(preview_questions_prefetch()).order_by('due_date')
 
     # Preview logic (adapted from your dashboard)
-    for ass in assignments:
-        questions = getattr(ass, 'questions', None)
-        if questions and questions.exists():
-            first_q = questions.first()
-            ass.display_question = f"{first_q.question[:50]}..." if first_q.question else "No question"
-            ass.display_hint = first_q.hint or ""
-        else:
-            ass.display_question = "No question available"
-            ass.display_hint = ""
+    attach_question_previews(assignments)
 
-    # Submissions for this subject's assignments
-    submissions = Submission.objects.filter(
-        assignment__subject=subject
-    ).select_related('assignment', 'student').order_by('-submitted_at')
+    # Submissions for this subject's assignments (keyset-paginated, newest first)
+    submissions = filter_submissions(Submission.objects.filter(
+        assignment__subject=subject, has_content=True
+    ).select_related('assignment', 'student'), request.GET)
+    submissions, next_cursor = keyset_page(submissions, request.GET.get('cursor'))
+
+    filters = request.GET.copy()
+    filters.pop('cursor', None)
 
     return render(request, 'core/teacher_subject_detail.html', {
         'subject': subject,
         'assignments': assignments,
+        'topic_stats': stats.topic_summary(assignments),
         'submissions': submissions,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'filters': filters,
+        'filter_query': filters.urlencode(),
     })
 
+@login_required
+@require_http_methods(["GET"])
+@replica_reads
+def gradebook_matrix(request, subject_id):
+    """Students x assignments grid with per-student and per-assignment means (?format=csv to download)."""
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user)
+    book = build_gradebook(subject)
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="gradebook-matrix-{subject.code}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['student'] + [f'{topic} ({ass_id})' for ass_id, topic, _ in book.assignments] + ['mean'])
+        for (_, username), cells, mean in book.rows():
+            writer.writerow([username] + ['' if c is None else f'{c:g}' for c in cells] + ['' if mean is None else f'{mean:.2f}'])
+        writer.writerow(['mean'] + ['' if m is None else f'{m:.2f}' for m in book.column_means]
+                        + ['' if book.overall_mean is None else f'{book.overall_mean:.2f}'])
+        return response
+
+    return render(request, 'core/gradebook.html', {
+        'subject': subject,
+        'book': book,
+        'rows': html_rows(book),
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def similarity_report(request, assignment_id):
+    """Most similar answer pairs for an assignment, from the winnowing fingerprint index."""
+    assignment = get_object_or_404(Assignment.objects.select_related('subject'), id=assignment_id, created_by=request.user)
+    pairs = similarity.assignment_report(assignment)
+    questions = Question.objects.in_bulk({pair['question_id'] for pair in pairs})
+    for pair in pairs:
+        pair['question'] = questions.get(pair['question_id'])
+    return render(request, 'core/similarity_report.html', {
+        'assignment': assignment,
+        'pairs': pairs,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+@replica_reads
+def export_gradebook(request, subject_id):
+    """Stream every submission of the subject as CSV (default) or NDJSON (?format=ndjson)."""
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.CONTENT_TYPES:
+        return JsonResponse({'success': False, 'error': f'Unknown format {fmt!r}'}, status=400)
+
+    # The rows are streamed after the view returns: pin the database this request reads from
+    rows = export.iter_gradebook(subject, fmt, using=router.db_for_read(Submission))
+    response = StreamingHttpResponse(rows, content_type=export.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="gradebook-{subject.code}.{fmt}"'
+    return response
+
+
 @login_required
 def delete_subject(request, subject_id):
     # Secure: Fetch only if owned by current teacher
@@ -598,35 +713,5 @@ def delete_subject(request, subject_id):
 
 
 def load_csv_data(subject_name):
-    questions_by_topic = {}
-    csv_path = 'questions.csv'  # Place next to manage.py
-    full_path = os.path.join(settings.BASE_DIR, csv_path)
-    
-    print(f"DEBUG: Filtering CSV for subject '{subject_name}' from {full_path}")  # Check console
-    
-    if not os.path.exists(full_path):
-        print("DEBUG: CSV not found - create 'questions.csv' in project root")
-        return {}, []
-    
-    try:
-        with open(full_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                subj = row.get('subject', '').strip()
-                if subj == subject_name:  # Filter by current subject
-                    topic = row.get('topic', '').strip()
-                    if topic:
-                        if topic not in questions_by_topic:
-                            questions_by_topic[topic] = []
-                        questions_by_topic[topic].append({
-                            'level': row.get('level', 'low').strip().lower(),
-                            'question': row.get('question', '').strip(),
-                            'hint': row.get('hint', '').strip()
-                        })
-        print(f"DEBUG: Filtered topics for '{subject_name}': {sorted(questions_by_topic.keys())}")
-    except Exception as e:
-        print(f"DEBUG: CSV error: {e}")
-    
-    topics = sorted(questions_by_topic.keys())
-    return questions_by_topic, topics
-
+    # Served from the per-worker question bank index; the CSV is only re-read when it changes
+    return get_question_bank().for_subject(subject_name)